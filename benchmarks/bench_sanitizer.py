@@ -0,0 +1,53 @@
+"""
+Microbenchmarks for core.sanitizer.
+
+Compares the current pipeline against the original strip/sub/escape/slice
+implementation on a few input shapes. Run from the repo root:
+
+    python benchmarks/bench_sanitizer.py
+"""
+
+import os
+import re
+import sys
+import timeit
+from html import escape as html_escape
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.sanitizer import sanitize_text
+
+
+def legacy_sanitize_text(text: str, max_length: int = 10000) -> str:
+    text = text.strip()
+    text = re.sub(r'<[^>]+>', '', text)
+    text = html_escape(text)
+    if len(text) > max_length:
+        text = text[:max_length]
+    return text
+
+
+PLAIN = "The quick brown fox jumps over the lazy dog. " * 200
+MARKUP = "<p>Fish & chips are \"great\" <b>value</b></p> " * 200
+LARGE = "<div>Section & notes</div> plain words follow here. " * 20000
+
+CASES = [
+    ("plain ~9KB", PLAIN, 10000),
+    ("markup ~9KB", MARKUP, 10000),
+    ("large 1MB, limit 10K", LARGE, 10000),
+    ("large 1MB, limit 200K", LARGE, 200000),
+]
+
+
+def main(number: int = 200) -> None:
+    print(f"{'case':<24}{'legacy (us)':>14}{'current (us)':>14}{'speedup':>10}")
+    for label, text, limit in CASES:
+        legacy = timeit.timeit(lambda: legacy_sanitize_text(text, limit), number=number)
+        current = timeit.timeit(lambda: sanitize_text(text, limit), number=number)
+        print(
+            f"{label:<24}{legacy / number * 1e6:>14.1f}"
+            f"{current / number * 1e6:>14.1f}{legacy / current:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Run throughput versus gunicorn worker count.
+
+Starts the app (with a fake, instant LLM) under gunicorn for each worker
+count, fires streaming runs from concurrent clients and reports runs/s.
+Run from the repo root with DATABASE_URL pointing at Postgres (SQLite
+serialises writers) on a machine with at least as many cores as workers:
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --runs 400
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _post(url: str, payload: dict) -> bytes:
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return response.read()
+
+
+def _wait_ready(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/templates", timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def measure(workers: int, runs: int, concurrency: int, port: int) -> float:
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        PORT=str(port),
+        RATE_LIMIT_ENABLED="false",
+        TRACE_SAMPLE_RATE="0",
+        SEMANTIC_CACHE_ENABLED="false",
+        MAX_QUEUED_RUNS=str(runs),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "benchmarks.fake_llm_app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url)
+        workflow = json.loads(_post(f"{base_url}/workflows", {
+            "name": "Benchmark",
+            "steps": [{"action": "clean"}, {"action": "summarize"}, {"action": "keypoints"}],
+        }))
+        url = f"{base_url}/workflows/{workflow['id']}/run_stream"
+        # Warm up every worker's pools before timing
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda i: _post(url, {"input_text": f"warmup {i}"}), range(workers * 4)))
+            start = time.perf_counter()
+            bodies = list(pool.map(lambda i: _post(url, {"input_text": f"run {i}"}), range(runs)))
+            elapsed = time.perf_counter() - start
+        completed = sum(1 for body in bodies if b"workflow_completed" in body)
+        if completed != runs:
+            print(f"  warning: {runs - completed} runs did not complete", file=sys.stderr)
+        return completed / elapsed
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'workers':>8}{'runs/s':>10}{'speedup':>10}{'efficiency':>12}")
+    baseline = None
+    for workers in args.workers:
+        throughput = measure(workers, args.runs, args.concurrency, args.port)
+        baseline = baseline or throughput
+        speedup = throughput / baseline
+        efficiency = speedup / (workers / args.workers[0])
+        print(f"{workers:>8}{throughput:>10.1f}{speedup:>9.2f}x{efficiency * 100:>11.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+The real app with the Groq client replaced by an instant fake that streams
+`FAKE_LLM_CHUNKS` chunks. Used by bench_workers.py so run throughput is
+bounded by server-side work (DB writes, event bus, encoding), not the LLM.
+"""
+
+import os
+import sys
+import types
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import app  # noqa: E402,F401
+from services.llm import llm_service  # noqa: E402
+
+CHUNKS = int(os.getenv("FAKE_LLM_CHUNKS", "200"))
+
+
+def _chunk(text):
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))])
+
+
+def _create(**kwargs):
+    return (_chunk(f"token{i} ") for i in range(CHUNKS))
+
+
+_client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=_create)))
+llm_service.get_client = lambda api_key=None: _client
@@ -15,7 +15,68 @@ class Settings:
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Optional read replica for GET endpoints; falls back to DATABASE_URL
+    DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL")
+
+    # Connection pool — streaming runs only hold a connection while writing,
+    # so these bound concurrent DB work rather than concurrent runs. They
+    # apply per worker process (see gunicorn.conf.py for the multi-worker budget).
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
     
+    # Maximum sanitized length of run input text
+    MAX_INPUT_LENGTH: int = int(os.getenv("MAX_INPUT_LENGTH", "10000"))
+
+    # Admission control: concurrent runs, bounded wait queue and latency SLO
+    MAX_CONCURRENT_RUNS: int = int(os.getenv("MAX_CONCURRENT_RUNS", "40"))
+    MAX_QUEUED_RUNS: int = int(os.getenv("MAX_QUEUED_RUNS", "20"))
+    RUN_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("RUN_QUEUE_TIMEOUT_SECONDS", "30"))
+    # Upstream time-to-first-token SLO; 0 disables latency-based shedding
+    LLM_LATENCY_SLO_MS: float = float(os.getenv("LLM_LATENCY_SLO_MS", "0"))
+
+    # Multi-worker deployments: shared state (e.g. redis://redis:6379/0).
+    # Unset keeps all state in process memory, which only suits one worker.
+    SHARED_STATE_URL: str = os.getenv("SHARED_STATE_URL")
+    RATE_LIMIT_STORAGE_URI: str = os.getenv("RATE_LIMIT_STORAGE_URI", os.getenv("SHARED_STATE_URL") or "memory://")
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+    # Run progress events
+    EVENT_BACKEND: str = os.getenv("EVENT_BACKEND", "redis" if os.getenv("SHARED_STATE_URL") else "memory")
+    EVENT_HISTORY_RUNS: int = int(os.getenv("EVENT_HISTORY_RUNS", "500"))
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+    # Near-duplicate step output cache (idempotent actions only)
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLDS: str = os.getenv("SEMANTIC_CACHE_THRESHOLDS", "classify:0.9,tone:0.9")
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))
+    SEMANTIC_CACHE_TTL_SECONDS: float = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+
+    # Token budgets (0 disables a budget)
+    TOKEN_BUDGET_PER_RUN: int = int(os.getenv("TOKEN_BUDGET_PER_RUN", "0"))
+    TOKEN_BUDGET_PER_KEY_DAILY: int = int(os.getenv("TOKEN_BUDGET_PER_KEY_DAILY", "0"))
+    # Cheaper model used instead of rejecting over-budget runs, if set
+    BUDGET_DOWNGRADE_MODEL: str = os.getenv("BUDGET_DOWNGRADE_MODEL", "")
+    EXPECTED_COMPLETION_TOKENS: int = int(os.getenv("EXPECTED_COMPLETION_TOKENS", "400"))
+
+    # Run tracing: sample rate, in-memory history and optional OTLP/JSON export
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+    TRACE_HISTORY_RUNS: int = int(os.getenv("TRACE_HISTORY_RUNS", "200"))
+    TRACE_EXPORT_PATH: str = os.getenv("TRACE_EXPORT_PATH")
+    TRACE_COLLECTOR_URL: str = os.getenv("TRACE_COLLECTOR_URL")
+
+    # Logging: records below WARNING can be sampled (globally and per logger,
+    # e.g. "main=0.1,routers.workflows=1") and rate limited per logger (0 = off)
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    LOG_SAMPLE_RATES: str = os.getenv("LOG_SAMPLE_RATES", "")
+    LOG_RATE_LIMIT_PER_SECOND: float = float(os.getenv("LOG_RATE_LIMIT_PER_SECOND", "0"))
+
+    # Enables admin-only diagnostics (run profiling) via the x-admin-token header
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN")
+
     # LLM
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
 
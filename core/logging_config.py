@@ -3,53 +3,251 @@ Structured JSON logging configuration.
 
 Provides a JSON formatter for all application logs, emitting structured
 log entries to stdout for production observability.
+
+Records are handed to a bounded queue on the calling thread and formatted
+and written by a background `QueueListener`, so request handlers never
+block on log I/O. Below WARNING, records can be sampled and rate limited
+per logger; warnings and errors are always kept.
 """
 
+import atexit
+import copy
 import logging
-import json
+import logging.handlers
+import queue
+import random
 import sys
-from datetime import datetime, timezone
+import threading
+import time
+from typing import Dict, Optional
+
+from core.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if orjson is not None:
+    def _encode(entry: dict) -> str:
+        return orjson.dumps(entry, default=str).decode()
+else:
+    import json
+    _encode = json.JSONEncoder(default=str, ensure_ascii=False).encode
+
+# Attributes every LogRecord has; anything else was passed via `extra={}`.
+# uvicorn adds `color_message` (the message with ANSI colour codes) to its own.
+_RECORD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "color_message"}
 
 
 class JsonFormatter(logging.Formatter):
     """Formats log records as single-line JSON objects."""
 
+    def __init__(self):
+        super().__init__()
+        self._second = None
+        self._second_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        # strftime once per second; records in the same second reuse it
+        second = int(created)
+        if second != self._second:
+            self._second_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._second = second
+        return f"{self._second_prefix}.{int((created - second) * 1e6):06d}+00:00"
+
     def format(self, record: logging.LogRecord) -> str:
         log_entry = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
 
-        # Include exception info if present
+        # Include exception info if present (pre-rendered when queued)
         if record.exc_info and record.exc_info[0] is not None:
             log_entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_entry["exception"] = record.exc_text
 
         # Include any extra fields passed via `extra={}`
-        for key in ("workflow_id", "run_id", "step", "action", "method", "path", "status_code", "duration_ms"):
-            if hasattr(record, key):
-                log_entry[key] = getattr(record, key)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                log_entry[key] = value
+
+        return _encode(log_entry)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Samples and rate limits records below WARNING, per logger.
+
+    `sample_rate` applies to every logger unless `overrides` maps the logger
+    (or a parent, e.g. "routers") to its own rate. `rate_limit` caps each
+    logger at that many records per second (0 disables). Kept records from
+    sampled loggers carry a `sample_rate` field for reweighting downstream.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, rate_limit: float = 0, overrides: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.overrides = overrides or {}
+        self._rates: Dict[str, float] = {}
+        self._buckets: Dict[str, list] = {}  # logger -> [tokens, last refill]
+        self._lock = threading.Lock()
+        self.sampled_out = 0
+        self.rate_limited = 0
+
+    def _rate_for(self, name: str) -> float:
+        rate = self._rates.get(name)
+        if rate is None:
+            rate = self.sample_rate
+            prefix = name
+            while prefix:
+                if prefix in self.overrides:
+                    rate = self.overrides[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._rates[name] = rate
+        return rate
+
+    def _take_token(self, name: str) -> bool:
+        # Room for at least one record, so rates below 1/s still let some through
+        capacity = max(1.0, self.rate_limit)
+        now = time.monotonic()
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = [capacity, now]
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * self.rate_limit)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        if rate < 1.0:
+            if random.random() >= rate:
+                with self._lock:
+                    self.sampled_out += 1
+                return False
+            record.sample_rate = rate
+        if self.rate_limit:
+            with self._lock:
+                if not self._take_token(record.name):
+                    self.rate_limited += 1
+                    return False
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records without formatting them; the listener thread does the
+    JSON encoding and I/O. Records are dropped (and counted) when the queue
+    is full rather than blocking the caller.
+    """
 
-        return json.dumps(log_entry)
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve everything that may change or reference live frames
+        # before the record crosses threads. Other handlers share the
+        # original record, so work on a copy.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Block rather than fail when stopping with a full queue
+        self.queue.put(self._sentinel)
+
+
+_traceback_formatter = logging.Formatter()
+_listener: Optional[_Listener] = None
+_queue_handler: Optional[AsyncQueueHandler] = None
+_sampling_filter: Optional[SamplingFilter] = None
+
+
+def _parse_overrides(value: str) -> Dict[str, float]:
+    """Parse "logger=rate,other.logger=rate" into a dict."""
+    overrides = {}
+    for item in value.split(","):
+        name, sep, rate = item.partition("=")
+        if sep and name.strip():
+            overrides[name.strip()] = float(rate)
+    return overrides
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # flushes records still in the queue
+        _listener = None
 
 
 def setup_logging(level: int = logging.INFO) -> None:
-    """Configure the root logger with JSON formatting to stdout."""
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(JsonFormatter())
+    """Configure the root logger with queued JSON logging to stdout."""
+    global _listener, _queue_handler, _sampling_filter
+    _stop_listener()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _sampling_filter = SamplingFilter(
+        sample_rate=settings.LOG_SAMPLE_RATE,
+        rate_limit=settings.LOG_RATE_LIMIT_PER_SECOND,
+        overrides=_parse_overrides(settings.LOG_SAMPLE_RATES),
+    )
+    _queue_handler = AsyncQueueHandler(log_queue)
+    _queue_handler.addFilter(_sampling_filter)
+    _listener = _Listener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
 
     root = logging.getLogger()
     root.setLevel(level)
     # Remove any default handlers (e.g. uvicorn's)
     root.handlers.clear()
-    root.addHandler(handler)
+    root.addHandler(_queue_handler)
 
     # Quiet down noisy third-party loggers
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
     logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
 
 
+atexit.register(_stop_listener)
+
+
+def get_log_stats() -> dict:
+    """Counters of the log pipeline, for health checks."""
+    if _queue_handler is None:
+        return {}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "sampled_out": _sampling_filter.sampled_out,
+        "rate_limited": _sampling_filter.rate_limited,
+    }
+
+
 def get_logger(name: str) -> logging.Logger:
     """Return a named logger. Use module __name__ as convention."""
     return logging.getLogger(name)
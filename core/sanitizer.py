@@ -5,15 +5,75 @@ All user-supplied text is sanitized at the Pydantic schema layer
 before it reaches the database or LLM. This ensures defense-in-depth:
 even if the frontend escaping is bypassed, the backend will never
 store raw HTML/script content.
+
+The pipeline runs on every request, so it is built to stay cheap on
+long documents: patterns are compiled once, text without '<' or '&'
+takes a fast path, and the slow path walks the input once in chunks,
+stopping as soon as `max_length` output characters are produced.
 """
 
 import re
 from html import escape as html_escape
 
+_TAG_RE = re.compile(r'<[^>]+>')
+# A trailing, possibly cut-off entity such as "&am" or "&#x2"
+_PARTIAL_ENTITY_RE = re.compile(r'&[#a-zA-Z0-9]{0,5}$')
+
+# Raw characters processed per pass on the slow path
+_MIN_CHUNK = 4096
+
 
 def strip_html_tags(text: str) -> str:
     """Remove all HTML tags from input text."""
-    return re.sub(r'<[^>]+>', '', text)
+    return _TAG_RE.sub('', text)
+
+
+def _truncate_escaped(text: str, max_length: int) -> str:
+    """Cut escaped text to `max_length` without splitting an HTML entity."""
+    if len(text) <= max_length:
+        return text
+    text = text[:max_length]
+    partial = _PARTIAL_ENTITY_RE.search(text)
+    if partial:
+        text = text[:partial.start()]
+    return text
+
+
+def _chunk_end(text: str, start: int, end: int) -> int:
+    """
+    Move a chunk boundary so no tag straddles it. A tag match always ends
+    at the first '>' after its '<', so everything up to the last '>' in the
+    chunk is safe; an unclosed '<' after it is carried into the next chunk.
+    """
+    if end >= len(text):
+        return len(text)
+    last_gt = text.rfind('>', start, end)
+    open_lt = text.find('<', last_gt + 1 if last_gt != -1 else start, end)
+    if open_lt == -1:
+        return end
+    if open_lt > start:
+        return open_lt
+    # The chunk opens with a '<' that is not closed inside it
+    close = text.find('>', end)
+    return len(text) if close == -1 else close + 1
+
+
+def _strip_and_escape(text: str, max_length: int) -> str:
+    """
+    Strip tags and escape in chunks, stopping once enough output exists.
+    Tag removal only shrinks text and escaping only grows it, so the input
+    past the point where the output limit is reached is never touched.
+    """
+    parts = []
+    produced = 0
+    pos = 0
+    while pos < len(text) and produced < max_length:
+        end = _chunk_end(text, pos, pos + max(max_length - produced, _MIN_CHUNK))
+        escaped = html_escape(_TAG_RE.sub('', text[pos:end]))
+        parts.append(escaped)
+        produced += len(escaped)
+        pos = end
+    return _truncate_escaped(''.join(parts), max_length)
 
 
 def sanitize_text(text: str, max_length: int = 10000) -> str:
@@ -22,21 +82,16 @@ def sanitize_text(text: str, max_length: int = 10000) -> str:
     1. Strip leading/trailing whitespace
     2. Remove HTML tags (defense-in-depth against XSS)
     3. Escape remaining HTML entities
-    4. Enforce maximum length
+    4. Enforce maximum length (never splitting an escaped entity)
     """
     text = text.strip()
-    text = strip_html_tags(text)
-    text = html_escape(text)
-    if len(text) > max_length:
-        text = text[:max_length]
-    return text
+    if '<' not in text and '&' not in text:
+        # Fast path: no tags, and escaping never shrinks text, so only
+        # the first `max_length` characters can reach the output.
+        return _truncate_escaped(html_escape(text[:max_length]), max_length)
+    return _strip_and_escape(text, max_length)
 
 
 def sanitize_name(text: str, max_length: int = 200) -> str:
     """Sanitize short-form fields like workflow names."""
-    text = text.strip()
-    text = strip_html_tags(text)
-    text = html_escape(text)
-    if len(text) > max_length:
-        text = text[:max_length]
-    return text
+    return sanitize_text(text, max_length=max_length)
@@ -4,6 +4,7 @@ from uuid import UUID
 from datetime import datetime
 from core.prompts import ActionType
 from core.sanitizer import sanitize_text, sanitize_name
+from core.config import settings
 
 class WorkflowStep(BaseModel):
     action: ActionType
@@ -44,6 +45,8 @@ class WorkflowCreate(WorkflowBase):
 class WorkflowRead(WorkflowBase):
     id: UUID
     created_at: datetime
+    template_key: Optional[str] = None
+    template_version: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
 
 class WorkflowRunCreate(BaseModel):
@@ -52,7 +55,7 @@ class WorkflowRunCreate(BaseModel):
     @field_validator('input_text')
     @classmethod
     def sanitize_input(cls, v: str) -> str:
-        v = sanitize_text(v)
+        v = sanitize_text(v, max_length=settings.MAX_INPUT_LENGTH)
         if not v:
             raise ValueError("Input text cannot be empty")
         return v
@@ -63,6 +66,8 @@ class WorkflowStepRunRead(BaseModel):
     step_order: int
     step_type: str
     output_text: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
 
 class WorkflowRunRead(BaseModel):
@@ -71,9 +76,30 @@ class WorkflowRunRead(BaseModel):
     input_text: str
     status: str
     created_at: datetime
+    model: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
     step_runs: List[WorkflowStepRunRead] = []
     model_config = ConfigDict(from_attributes=True)
 
+class TokenUsage(BaseModel):
+    runs: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+class WorkflowUsage(TokenUsage):
+    workflow_id: UUID
+    name: Optional[str] = None
+
+class ApiKeyUsage(TokenUsage):
+    api_key_id: str
+
+class UsageReport(BaseModel):
+    since: datetime
+    workflows: List[WorkflowUsage]
+    api_keys: List[ApiKeyUsage]
+
 class KeyValidationRequest(BaseModel):
     api_key: str
 
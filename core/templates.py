@@ -4,20 +4,25 @@ class TemplateStep(TypedDict):
     pass # Structure implied by usage, effectively just a list of strings for now in the simple case, 
          # but let's stick to the plan's structure: "steps": ["clean", "summarize", "keypoints"]
 
+# Each template is seeded as an immutable workflow per version. Bump
+# "version" when changing a template; runs of older versions keep theirs.
 PREDEFINED_TEMPLATES = {
     "quick": {
         "label": "Quick Understanding", 
         "description": "Clean text, summarize it, and extract key points.",
-        "steps": ["clean", "summarize", "keypoints"]
+        "steps": ["clean", "summarize", "keypoints"],
+        "version": 1
     },
     "simplify": {
         "label": "Simplify", 
         "description": "Clean text, rewrite it simply, and provide an analogy.",
-        "steps": ["clean", "simplify", "analogy"]
+        "steps": ["clean", "simplify", "analogy"],
+        "version": 1
     },
     "office": {
         "label": "Office Assistant", 
         "description": "Clean text, classify it, and analyze the tone.",
-        "steps": ["clean", "classify", "tone"]
+        "steps": ["clean", "classify", "tone"],
+        "version": 1
     }
 }
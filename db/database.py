@@ -1,13 +1,35 @@
-from sqlalchemy import create_engine, Column, String, Text, DateTime, ForeignKey, Integer, JSON
+from sqlalchemy import create_engine, inspect, text, Column, String, Text, DateTime, ForeignKey, Integer, JSON
 from sqlalchemy.orm import sessionmaker, relationship, DeclarativeBase
 from sqlalchemy.dialects.postgresql import UUID
+from contextlib import contextmanager
 import uuid
 from datetime import datetime, timezone
 from core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+
+def _engine_options(url: str) -> dict:
+    """Pool settings for `create_engine`. SQLite (used in tests) manages its own pool."""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url and not url.startswith("sqlite"):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return options
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only traffic goes to the replica when one is configured
+if settings.DATABASE_READ_URL:
+    read_engine = create_engine(settings.DATABASE_READ_URL, **_engine_options(settings.DATABASE_READ_URL))
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 class Base(DeclarativeBase):
     pass
 
@@ -18,6 +40,89 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def session_scope():
+    """
+    Short-lived session for a single unit of work. Used by long-running
+    streams so a connection is only checked out while writing, not for
+    the whole duration of the LLM calls.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def add_missing_columns(conn) -> None:
+    """
+    `create_all` never alters existing tables, so add columns introduced
+    after a table was first created, with their indexes. New columns are
+    nullable.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                for index in table.indexes:
+                    if column.name in index.columns:
+                        index.create(conn, checkfirst=True)
+
+# Arbitrary constant identifying the schema lock among Postgres advisory locks
+SCHEMA_LOCK_ID = 72_010_001
+
+def init_db(bind=None, seeders=()) -> None:
+    """
+    Create tables, add missing columns and run `seeders` (callables taking
+    the connection). Safe to call from every worker at startup: on Postgres
+    an advisory lock serialises concurrent callers, so workers never race
+    on CREATE TABLE / ALTER TABLE or seed duplicate rows.
+    """
+    bind = bind or engine
+    with bind.connect() as conn:
+        use_lock = conn.dialect.name == "postgresql"
+        if use_lock:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+        try:
+            Base.metadata.create_all(bind=conn)
+            add_missing_columns(conn)
+            conn.commit()
+            for seed in seeders:
+                seed(conn)
+            conn.commit()
+        finally:
+            if use_lock:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": SCHEMA_LOCK_ID})
+                conn.commit()
+
+def get_pool_stats() -> dict:
+    """Snapshot of connection pool usage for the primary and read engines."""
+    stats = {}
+    for name, eng in (("primary", engine), ("read", read_engine)):
+        pool = eng.pool
+        stats[name] = {
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        }
+    return stats
+
 class Workflow(Base):
     __tablename__ = "workflows"
 
@@ -26,6 +131,9 @@ class Workflow(Base):
     description = Column(Text)
     steps = Column(JSON)  # Stores JSONB in Postgres
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    content_hash = Column(String, index=True)  # sha256 of name, description and steps
+    template_key = Column(String, index=True)  # set on immutable, seeded template workflows
+    template_version = Column(Integer)
 
     runs = relationship("WorkflowRun", back_populates="workflow")
 
@@ -38,6 +146,10 @@ class WorkflowRun(Base):
     input_text = Column(Text)
     status = Column(String, default="running") # running, completed, failed
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    model = Column(String)
+    api_key_id = Column(String, index=True)  # sha256 prefix of the client key, or "server"
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
 
     workflow = relationship("Workflow", back_populates="runs")
     step_runs = relationship("WorkflowStepRun", back_populates="workflow_run")
@@ -51,5 +163,7 @@ class WorkflowStepRun(Base):
     step_order = Column(Integer)
     step_type = Column(String)
     output_text = Column(Text)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
 
     workflow_run = relationship("WorkflowRun", back_populates="step_runs")
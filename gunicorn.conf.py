@@ -0,0 +1,52 @@
+"""
+Gunicorn configuration for multi-worker deployments.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Each worker is a separate process with its own DB pool, run executor and
+admission slots (DB_POOL_SIZE, DB_MAX_OVERFLOW and MAX_CONCURRENT_RUNS are
+per worker). Set SHARED_STATE_URL so run events, traces and rate limits are
+shared between workers.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# One worker unless asked for more: without SHARED_STATE_URL, rate limits,
+# admission limits and run subscriptions are per process, and inside a
+# container cpu_count() reports the host's cores, not the CPU quota.
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# DB pools are per worker, so a deployment opens up to
+# workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections per database (again
+# for DATABASE_READ_URL). Unless the pool settings are set explicitly, split
+# DB_MAX_CONNECTIONS (default 80, under Postgres' default max_connections of
+# 100) between workers. Workers inherit these defaults from the arbiter.
+_per_worker = max(int(os.getenv("DB_MAX_CONNECTIONS", "80")) // workers, 2)
+os.environ.setdefault("DB_POOL_SIZE", str(min(_per_worker // 2, 20)))
+os.environ.setdefault("DB_MAX_OVERFLOW", str(min(_per_worker - _per_worker // 2, 20)))
+
+# Streaming runs keep connections open for minutes; workers heartbeat to the
+# arbiter independently of requests, so this only catches hung workers.
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "60"))
+keepalive = 5
+
+# X-Forwarded-For is only trusted from these addresses (as with uvicorn
+# --proxy-headers). It sets the client address used for per-IP rate limits,
+# so set FORWARDED_ALLOW_IPS to your proxy's address(es), e.g. "10.0.0.0/8"
+# or "10.0.0.5,10.0.0.6", never "*" unless the app is unreachable otherwise.
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Requests are logged by the app's JSON logging middleware
+accesslog = None
+
+
+def when_ready(server):
+    if workers > 1 and not os.getenv("SHARED_STATE_URL"):
+        server.log.warning(
+            "Running %d workers without SHARED_STATE_URL: rate limits and admission "
+            "limits apply per worker, and run subscriptions only work on the "
+            "worker executing the run", workers,
+        )
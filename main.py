@@ -6,22 +6,28 @@ from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+import logging
 import time
 
 from core.config import settings
 from core.logging_config import setup_logging, get_logger
-from db.database import engine, Base
-from routers import system, pages, workflows
+from db.database import init_db
+from services.templates import seed_templates
+from routers import system, pages, workflows, templates, events, usage
 
 # Initialize structured JSON logging
 setup_logging()
 logger = get_logger(__name__)
 
-# Create Tables
-Base.metadata.create_all(bind=engine)
+# Create Tables (worker-safe when several workers start at once)
+init_db(seeders=[seed_templates])
 
 # Rate limiter (uses client IP by default)
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
 
 app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION)
 app.state.limiter = limiter
@@ -36,7 +42,7 @@ app.add_middleware(
         "https://workflow-builder-db32.onrender.com",
     ],
     allow_methods=["GET", "POST"],
-    allow_headers=["Content-Type", "x-groq-api-key"],
+    allow_headers=["Content-Type", "Cache-Control", "x-groq-api-key", "x-run-priority", "x-admin-token", "x-profile"],
 )
 
 # Security headers middleware
@@ -62,7 +68,9 @@ async def log_requests(request: Request, call_next):
     start = time.perf_counter()
     response = await call_next(request)
     duration_ms = round((time.perf_counter() - start) * 1000, 2)
-    logger.info(
+    # Server errors are logged as warnings so sampling never drops them
+    logger.log(
+        logging.WARNING if response.status_code >= 500 else logging.INFO,
         "Request completed",
         extra={
             "method": request.method,
@@ -81,6 +89,9 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 app.include_router(pages.router)
 app.include_router(system.router)
 app.include_router(workflows.router)
+app.include_router(templates.router)
+app.include_router(events.router)
+app.include_router(usage.router)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
@@ -0,0 +1,147 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from uuid import UUID
+import asyncio
+import json
+
+from db.database import get_read_db, ReadSessionLocal, WorkflowRun
+from core.config import settings
+from core.logging_config import get_logger
+from services.events import event_bus, RunNotFound
+
+router = APIRouter(tags=["events"])
+logger = get_logger(__name__)
+
+
+def _parse_run_id(run_id: str) -> str:
+    try:
+        return str(UUID(run_id))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+
+def _snapshot_events(run: WorkflowRun) -> list:
+    """Rebuild progress events from the DB for runs the event bus no longer holds."""
+    events = []
+    for step_run in sorted(run.step_runs, key=lambda s: s.step_order):
+        events.append({"step": step_run.step_order, "action": step_run.step_type, "status": "started"})
+        events.append({"step": step_run.step_order, "status": "completed", "final_output": step_run.output_text})
+    if run.status == "completed":
+        events.append({"status": "workflow_completed", "run_id": str(run.id)})
+    elif run.status == "failed":
+        events.append({"error": "Workflow execution failed. Please try again."})
+    else:
+        events.append({"status": run.status, "run_id": str(run.id)})
+    return events
+
+
+def _format_sse(event_id: int, event: dict) -> str:
+    return f"id: {event_id}\ndata: {json.dumps(event)}\n\n"
+
+
+def _format_snapshot(events: list) -> str:
+    # No `id:` line: snapshot events do not share the bus's id space, so
+    # the client's Last-Event-ID is left as is and the snapshot replaces
+    # whatever state it had built for the run.
+    return f"event: snapshot\ndata: {json.dumps({'events': events})}\n\n"
+
+
+@router.get("/runs/{run_id}/events")
+def stream_run_events(run_id: str, request: Request, last_event_id: int = 0, db: Session = Depends(get_read_db)):
+    """
+    Server-Sent Events stream of a run's progress. Reconnecting clients
+    resume after the `Last-Event-ID` header (or `last_event_id` query).
+    Runs no longer on the event bus are sent as a single `snapshot` event
+    rebuilt from the DB, regardless of `Last-Event-ID`.
+    """
+    run_id = _parse_run_id(run_id)
+    header_id = request.headers.get("last-event-id")
+    if header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+
+    if event_bus.has_run(run_id):
+        async def live_stream():
+            try:
+                async for item in event_bus.subscribe(run_id, after_id=last_event_id, heartbeat=settings.SSE_HEARTBEAT_SECONDS):
+                    if item is None:
+                        yield ": keepalive\n\n"
+                    else:
+                        yield _format_sse(*item)
+            except RunNotFound:
+                # Evicted since has_run(); the request session is already closed
+                with ReadSessionLocal() as session:
+                    run = session.query(WorkflowRun).filter(WorkflowRun.id == UUID(run_id)).first()
+                    if run:
+                        yield _format_snapshot(_snapshot_events(run))
+        body = live_stream()
+    else:
+        run = db.query(WorkflowRun).filter(WorkflowRun.id == UUID(run_id)).first()
+        if not run:
+            raise HTTPException(status_code=404, detail="Run not found")
+        body = iter([_format_snapshot(_snapshot_events(run))])
+
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws/runs")
+async def run_events_socket(websocket: WebSocket):
+    """
+    Multiplexed run subscriptions over one socket. Clients send
+    {"action": "subscribe", "run_id": ..., "last_event_id": 0} or
+    {"action": "unsubscribe", "run_id": ...}; the server sends
+    {"run_id": ..., "id": n, "event": {...}} for every event.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    subscriptions = {}
+
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def forward(run_id: str, after_id: int):
+        try:
+            async for event_id, event in event_bus.subscribe(run_id, after_id=after_id):
+                await send({"run_id": run_id, "id": event_id, "event": event})
+        except RunNotFound:
+            await send({"run_id": run_id, "error": "Run is not active"})
+        subscriptions.pop(run_id, None)
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action") if isinstance(message, dict) else None
+            try:
+                run_id = str(UUID(str(message.get("run_id"))))
+            except (ValueError, AttributeError):
+                await send({"error": "Invalid run_id"})
+                continue
+
+            if action == "subscribe":
+                if run_id in subscriptions:
+                    continue
+                if not event_bus.has_run(run_id):
+                    await send({"run_id": run_id, "error": "Run is not active"})
+                    continue
+                after_id = message.get("last_event_id") or 0
+                if not isinstance(after_id, int):
+                    after_id = 0
+                subscriptions[run_id] = asyncio.create_task(forward(run_id, after_id))
+            elif action == "unsubscribe":
+                task = subscriptions.pop(run_id, None)
+                if task:
+                    task.cancel()
+            else:
+                await send({"error": "Unknown action"})
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        logger.warning("Run events socket closed with error", exc_info=True)
+    finally:
+        for task in subscriptions.values():
+            task.cancel()
@@ -6,21 +6,28 @@ from groq import Groq
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-from db.database import get_db, WorkflowRun
+from db.database import get_db, get_read_db, get_pool_stats, WorkflowRun
 from core.schemas import KeyValidationRequest, WorkflowRunRead
-from core.logging_config import get_logger
+from core.config import settings
+from core.logging_config import get_logger, get_log_stats
+from services.admission import admission
+from services.tracing import tracer, admin_authorized
 from typing import List
 
 router = APIRouter()
 logger = get_logger(__name__)
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
 
 @router.get("/health")
 @limiter.limit("30/minute")
 def health_check(request: Request, db: Session = Depends(get_db)):
     try:
         db.execute(text("SELECT 1"))
-        return {"status": "healthy", "database": "connected"}
+        return {"status": "healthy", "database": "connected", "pool": get_pool_stats(), "admission": admission.stats(), "logging": get_log_stats()}
     except Exception:
         logger.error("Health check failed", exc_info=True)
         raise HTTPException(status_code=500, detail="Service unavailable")
@@ -42,14 +49,18 @@ def validate_key(request: Request, payload: KeyValidationRequest):
         )
 
 @router.get("/runs", response_model=List[WorkflowRunRead])
-def read_runs(skip: int = 0, limit: int = 5, db: Session = Depends(get_db)):
+def read_runs(skip: int = 0, limit: int = 5, db: Session = Depends(get_read_db)):
     limit = min(limit, 50)
     runs = db.query(WorkflowRun).order_by(WorkflowRun.created_at.desc()).offset(skip).limit(limit).all()
     return runs
 
-@router.get("/templates")
-def get_templates():
-    from core.templates import PREDEFINED_TEMPLATES
-    return PREDEFINED_TEMPLATES
-
-
+@router.get("/runs/{run_id}/trace")
+def read_run_trace(run_id: str, request: Request):
+    """Span timeline of a recent, sampled run. Profiles are only shown to admins."""
+    timeline = tracer.get_timeline(run_id)
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    profile = timeline.pop("profile", None)
+    if profile and admin_authorized(request):
+        timeline["profile"] = profile
+    return timeline
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+
+from db.database import get_db, get_read_db
+from core.schemas import WorkflowRunCreate
+from core.templates import PREDEFINED_TEMPLATES
+from routers.workflows import run_stream_limit, start_run_stream
+from services.templates import get_template_workflow_id
+
+router = APIRouter(prefix="/templates", tags=["templates"])
+
+
+@router.get("")
+def get_templates(db: Session = Depends(get_read_db)):
+    """Predefined templates with the id of the workflow backing their current version."""
+    templates = {}
+    for key, template in PREDEFINED_TEMPLATES.items():
+        workflow_id = get_template_workflow_id(db, key)
+        templates[key] = {
+            **template,
+            "workflow_id": str(workflow_id) if workflow_id else None,
+        }
+    return templates
+
+
+@router.post("/{template_key}/run_stream")
+@run_stream_limit
+def run_template_stream(template_key: str, run_request: WorkflowRunCreate, request: Request, db: Session = Depends(get_db)):
+    """Run a template directly, without creating a workflow first."""
+    workflow_id = get_template_workflow_id(db, template_key)
+    if workflow_id is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return start_run_stream(str(workflow_id), run_request, request, db)
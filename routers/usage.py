@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+
+from db.database import get_read_db, Workflow, WorkflowRun
+from core.schemas import UsageReport
+
+router = APIRouter(tags=["usage"])
+
+
+def _token_columns():
+    prompt = func.coalesce(func.sum(WorkflowRun.prompt_tokens), 0)
+    completion = func.coalesce(func.sum(WorkflowRun.completion_tokens), 0)
+    return func.count(WorkflowRun.id), prompt, completion
+
+
+def _usage_row(runs: int, prompt: int, completion: int) -> dict:
+    return {
+        "runs": runs,
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+    }
+
+
+@router.get("/usage", response_model=UsageReport)
+def read_usage(days: int = 7, db: Session = Depends(get_read_db)):
+    """Token usage aggregated per workflow and per API key over the last `days` days."""
+    days = min(max(days, 1), 90)
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+
+    by_workflow = (
+        db.query(WorkflowRun.workflow_id, Workflow.name, *_token_columns())
+        .join(Workflow, Workflow.id == WorkflowRun.workflow_id)
+        .filter(WorkflowRun.created_at >= since)
+        .group_by(WorkflowRun.workflow_id, Workflow.name)
+        .all()
+    )
+    by_key = (
+        db.query(WorkflowRun.api_key_id, *_token_columns())
+        .filter(WorkflowRun.created_at >= since, WorkflowRun.api_key_id.isnot(None))
+        .group_by(WorkflowRun.api_key_id)
+        .all()
+    )
+
+    workflows = [
+        {"workflow_id": workflow_id, "name": name, **_usage_row(runs, prompt, completion)}
+        for workflow_id, name, runs, prompt, completion in by_workflow
+    ]
+    api_keys = [
+        {"api_key_id": key_id, **_usage_row(runs, prompt, completion)}
+        for key_id, runs, prompt, completion in by_key
+    ]
+    workflows.sort(key=lambda row: row["total_tokens"], reverse=True)
+    api_keys.sort(key=lambda row: row["total_tokens"], reverse=True)
+    return {"since": since, "workflows": workflows, "api_keys": api_keys}
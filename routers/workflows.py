@@ -1,25 +1,168 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from db.database import get_db, Workflow, WorkflowRun, WorkflowStepRun
+from db.database import get_db, session_scope, Workflow, WorkflowRun, WorkflowStepRun
 from core.schemas import WorkflowCreate, WorkflowRead, WorkflowRunCreate, WorkflowRunRead, LLMStepOutput
 from core.logging_config import get_logger
 from services.llm import llm_service
+from services.events import event_bus
+from services.cache import step_cache
+from services.admission import admission, Overloaded, PRIORITIES
+from services.tracing import tracer, admin_authorized, RunProfiler
+from services.templates import definition_hash, find_by_hash
+from services.usage import BudgetExceeded, api_key_id, estimate_tokens, extract_usage, predict_run_tokens, select_model, token_ledger
+from core.config import settings
 from core.prompts import PROMPTS
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID
 import json
+import threading
+import time
 
 router = APIRouter(prefix="/workflows", tags=["workflows"])
 logger = get_logger(__name__)
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
+# One counter for every endpoint that starts a streaming run
+run_stream_limit = limiter.shared_limit("5/minute", scope="run_stream")
+
+# Runs execute here, decoupled from the HTTP response, so a client that
+# disconnects can resubscribe and other clients can watch the same run.
+# Queued runs wait for an admission slot on their own worker thread.
+run_executor = ThreadPoolExecutor(
+    max_workers=settings.MAX_CONCURRENT_RUNS + settings.MAX_QUEUED_RUNS,
+    thread_name_prefix="run",
+)
+
+LLM_MODEL = "llama-3.3-70b-versatile"
+
+RUN_FAILED_EVENT = {"error": "Workflow execution failed. Please try again."}
+RUN_BUSY_EVENT = {"error": "Server is busy. Please try again shortly."}
+
+PLAN_CACHE_SIZE = 1024
+_plan_cache: "OrderedDict[UUID, list]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+def _publish_run(run_id: str, events) -> None:
+    """Drain a run's event generator into the event bus, flagging the last event as final."""
+    pending = None
+    try:
+        for event in events:
+            if pending is not None:
+                event_bus.publish(run_id, pending)
+            pending = event
+    except Exception:
+        logger.error("Run publisher failed", extra={"run_id": run_id}, exc_info=True)
+        if pending is not None:
+            event_bus.publish(run_id, pending)
+        pending = None
+    event_bus.publish(run_id, pending or RUN_FAILED_EVENT, final=True)
+
+def _admitted_events(ticket, trace, profile, run_pk, events, reservation):
+    """
+    Hold a run's events until its admission ticket is granted, then release
+    the slot, any unused token reservation and close the run's trace when
+    done. Runs on the executor thread.
+    """
+    status = "failed"
+    profiler = None
+    try:
+        if not ticket.granted:
+            yield {"status": "queued"}
+            with trace.span("admission.queue"):
+                admitted = ticket.wait()
+            if not admitted:
+                logger.warning("Queued run timed out waiting for a slot", extra={"run_id": str(run_pk)})
+                _set_run_status(run_pk, "failed")
+                yield RUN_BUSY_EVENT
+                return
+        if profile:
+            profiler = RunProfiler()
+            profiler.start()
+        for event in events:
+            if event.get("status") == "workflow_completed":
+                status = "completed"
+            yield event
+    finally:
+        ticket.release()
+        reservation.release()
+        if profiler is not None:
+            trace.profile = profiler.stop()
+        tracer.finish(trace, status)
+
+def _get_workflow(db: Session, workflow_id: str):
+    """Look up a workflow by id; malformed ids are treated as not found."""
+    try:
+        workflow_pk = UUID(workflow_id)
+    except ValueError:
+        return None
+    return db.query(Workflow).filter(Workflow.id == workflow_pk).first()
+
+def _get_plan(db: Session, workflow_id: str):
+    """
+    (workflow_pk, steps, cached) for a workflow, or None if it does not exist.
+    Workflow rows are never modified after creation, so plans are cached by
+    id; deduplicated and template workflows make the hot ones shared.
+    """
+    try:
+        workflow_pk = UUID(workflow_id)
+    except ValueError:
+        return None
+    with _plan_cache_lock:
+        steps = _plan_cache.get(workflow_pk)
+        if steps is not None:
+            _plan_cache.move_to_end(workflow_pk)
+            return workflow_pk, steps, True
+    workflow = db.query(Workflow).filter(Workflow.id == workflow_pk).first()
+    if not workflow:
+        return None
+    steps = list(workflow.steps)
+    with _plan_cache_lock:
+        _plan_cache[workflow_pk] = steps
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return workflow_pk, steps, False
+
+def _run_priority(request: Request) -> str:
+    """
+    Admission priority from `x-run-priority`. Anyone may lower their own
+    priority; "high" is only granted to admin callers. Anything else is normal.
+    """
+    priority = request.headers.get("x-run-priority", "normal").lower()
+    if priority not in PRIORITIES or (priority == "high" and not admin_authorized(request)):
+        return "normal"
+    return priority
+
+def _set_run_status(run_pk, status: str) -> None:
+    with session_scope() as session:
+        session.query(WorkflowRun).filter(WorkflowRun.id == run_pk).update({"status": status})
 
 @router.post("", response_model=WorkflowRead)
 def create_workflow(workflow: WorkflowCreate, db: Session = Depends(get_db)):
+    steps = [step.model_dump(mode="json") for step in workflow.steps]
+    content_hash = definition_hash(workflow.name, workflow.description, steps)
+
+    # Identical definitions share one row (and its cached plan)
+    existing = find_by_hash(db, content_hash)
+    if existing:
+        logger.info(
+            "Workflow deduplicated",
+            extra={"workflow_id": str(existing.id)},
+        )
+        return existing
+
     db_workflow = Workflow(
         name=workflow.name,
         description=workflow.description,
-        steps=[step.model_dump() for step in workflow.steps]
+        steps=steps,
+        content_hash=content_hash,
     )
     db.add(db_workflow)
     db.commit()
@@ -32,7 +175,7 @@ def create_workflow(workflow: WorkflowCreate, db: Session = Depends(get_db)):
 
 @router.post("/{workflow_id}/run", response_model=WorkflowRunRead)
 def run_workflow_sync(workflow_id: str, run_request: WorkflowRunCreate, db: Session = Depends(get_db)):
-    workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+    workflow = _get_workflow(db, workflow_id)
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
@@ -51,116 +194,237 @@ def run_workflow_sync(workflow_id: str, run_request: WorkflowRunCreate, db: Sess
     return db_run
 
 @router.post("/{workflow_id}/run_stream")
-@limiter.limit("5/minute")
+@run_stream_limit
 def run_workflow_stream(workflow_id: str, run_request: WorkflowRunCreate, request: Request, db: Session = Depends(get_db)):
-    workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
-    if not workflow:
+    return start_run_stream(workflow_id, run_request, request, db)
+
+def start_run_stream(workflow_id: str, run_request: WorkflowRunCreate, request: Request, db: Session):
+    """Admit and start a streaming run. Shared by the workflow and template endpoints."""
+    # Shed load before touching the DB or the LLM
+    try:
+        ticket = admission.admit(_run_priority(request))
+    except Overloaded as exc:
+        logger.warning("Run rejected by admission control", extra={"workflow_id": workflow_id, "reason": exc.reason})
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy. Please try again shortly.",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+    try:
+        return _start_stream(workflow_id, run_request, request, db, ticket)
+    except BaseException:
+        ticket.release()
+        raise
+
+def _start_stream(workflow_id: str, run_request: WorkflowRunCreate, request: Request, db: Session, ticket):
+    profile = admin_authorized(request) and request.headers.get("x-profile") == "1"
+    trace = tracer.start_run(force=profile, **{"workflow.id": workflow_id})
+
+    with trace.span("db.load_workflow") as load_span:
+        plan = _get_plan(db, workflow_id)
+        load_span.set("plan.cached", plan is not None and plan[2])
+    if not plan:
         raise HTTPException(status_code=404, detail="Workflow not found")
 
+    # The plan is a copy of the steps: the request session is closed once
+    # we return, and the generator must not hold its connection.
+    workflow_pk, steps, _ = plan
+
+    # Get API Key
+    header_key = request.headers.get("x-groq-api-key")
+    client = llm_service.get_client(header_key)
+    key_id = api_key_id(header_key)
+
+    # Enforce token budgets before anything is executed
+    predicted_tokens = predict_run_tokens(steps, run_request.input_text)
+    # Reserve first so concurrent runs of the same key see each other
+    reservation = token_ledger.reserve(key_id, predicted_tokens)
+    try:
+        with trace.span("budget.check", predicted_tokens=predicted_tokens):
+            model = select_model(db, key_id, predicted_tokens, LLM_MODEL, reserved=reservation.others)
+    except BudgetExceeded:
+        reservation.release()
+        logger.warning(
+            "Run rejected by token budget",
+            extra={"workflow_id": workflow_id, "predicted_tokens": predicted_tokens},
+        )
+        raise HTTPException(status_code=429, detail="Token budget exceeded")
+
     # Create Run Record
     db_run = WorkflowRun(
-        workflow_id=workflow.id,
+        workflow_id=workflow_pk,
         input_text=run_request.input_text,
-        status="running"
+        status="running",
+        model=model,
+        api_key_id=key_id,
     )
-    db.add(db_run)
-    db.commit()
-    db.refresh(db_run)
+    with trace.span("db.create_run"):
+        try:
+            db.add(db_run)
+            db.commit()
+            db.refresh(db_run)
+        except Exception:
+            reservation.release()
+            raise
 
-    run_id = str(db_run.id)
+    run_pk = db_run.id
+    run_id = str(run_pk)
+    db.close()
+    tracer.register(run_id, trace)
     logger.info(
         "Streaming workflow run started",
-        extra={"workflow_id": workflow_id, "run_id": run_id},
+        extra={"workflow_id": workflow_id, "run_id": run_id, "model": model},
     )
 
-    # Get API Key
-    header_key = request.headers.get("x-groq-api-key")
-    client = llm_service.get_client(header_key)
+    use_cache = "no-cache" not in request.headers.get("cache-control", "")
 
-    # Sync generator — StreamingResponse will run this in a threadpool,
-    # so blocking Groq SDK calls do NOT block the async event loop.
+    # Sync generator of progress events — drained on the run executor, so
+    # blocking Groq SDK calls do NOT block the async event loop.
     def coherent_generator():
         if not client:
             logger.warning("API key missing for streaming run", extra={"run_id": run_id})
-            yield json.dumps({"error": "API Key missing"}) + "\n"
+            yield {"error": "API Key missing"}
             return
 
         current_input = run_request.input_text
+        run_prompt_tokens = 0
+        run_completion_tokens = 0
         
         try:
-            for index, step in enumerate(workflow.steps):
+            for index, step in enumerate(steps):
                 action = step.get('action')
-                yield json.dumps({"step": index + 1, "action": action, "status": "started"}) + "\n"
+                with trace.span("step", step=index + 1, action=action) as step_span:
+                    yield {"step": index + 1, "action": action, "status": "started"}
                 
-                prompt = PROMPTS.get(action).format(input_text=current_input)
+                    with trace.span("prompt.build"):
+                        prompt = PROMPTS.get(action).format(input_text=current_input)
                 
-                MAX_RETRIES = 1
-                step_output = ""
-                attempt = 0
+                    MAX_RETRIES = 1
+                    step_output = ""
+                    attempt = 0
+                    prompt_tokens = 0
+                    completion_tokens = 0
+
+                    # Near-duplicate inputs of idempotent actions reuse a cached output
+                    cached_output = None
+                    if use_cache and (step.get('params') or {}).get('cache', True):
+                        with trace.span("cache.lookup") as cache_span:
+                            cached_output = step_cache.get(action, model, current_input)
+                            cache_span.set("cache.hit", cached_output is not None)
+                    if cached_output is not None:
+                        step_output = cached_output
+                        yield {"step": index + 1, "chunk": cached_output, "cached": True}
                 
-                while attempt <= MAX_RETRIES:
-                    # Sync stream call — safe inside sync generator
-                    stream = client.chat.completions.create(
-                        messages=[{"role": "user", "content": prompt}],
-                        model="llama-3.3-70b-versatile",
-                        stream=True
-                    )
+                    while cached_output is None and attempt <= MAX_RETRIES:
+                        with trace.span("llm.request", attempt=attempt + 1, model=model) as llm_span:
+                            # Sync stream call — safe inside sync generator
+                            requested_at = time.perf_counter()
+                            stream = client.chat.completions.create(
+                                messages=[{"role": "user", "content": prompt}],
+                                model=model,
+                                stream=True
+                            )
+                            llm_span.add_event("connected")
                     
-                    step_output = ""
-                    for chunk in stream:
-                        content = chunk.choices[0].delta.content
-                        if content:
-                            step_output += content
-                            yield json.dumps({"step": index + 1, "chunk": content}) + "\n"
+                            step_output = ""
+                            usage = None
+                            chunk_count = 0
+                            for chunk in stream:
+                                if chunk_count == 0:
+                                    admission.record_llm_latency(time.perf_counter() - requested_at)
+                                    llm_span.add_event("first_token")
+                                chunk_count += 1
+                                usage = extract_usage(chunk) or usage
+                                if not chunk.choices:
+                                    continue
+                                content = chunk.choices[0].delta.content
+                                if content:
+                                    step_output += content
+                                    yield {"step": index + 1, "chunk": content}
+                            llm_span.add_event("last_token")
+                            llm_span.set("llm.chunks", chunk_count)
+
+                        # Every attempt is billed; estimate when the provider sent no usage
+                        if usage is None:
+                            usage = (estimate_tokens(prompt), estimate_tokens(step_output))
+                        prompt_tokens += usage[0]
+                        completion_tokens += usage[1]
                     
-                    # If output is non-empty, break out — success
-                    if step_output.strip():
-                        break
+                        # If output is non-empty, break out — success
+                        if step_output.strip():
+                            break
                     
-                    # Empty output — retry with repair prompt
-                    attempt += 1
-                    if attempt <= MAX_RETRIES:
-                        logger.warning(
-                            "Empty LLM output, retrying with repair prompt",
-                            extra={"run_id": run_id, "step": index + 1, "action": action, "attempt": attempt},
-                        )
-                        yield json.dumps({"step": index + 1, "status": "retrying", "reason": "empty output"}) + "\n"
-                        prompt = (
-                            f"The previous attempt returned an empty response. "
-                            f"Please try again carefully.\n\n{prompt}"
-                        )
+                        # Empty output — retry with repair prompt
+                        attempt += 1
+                        if attempt <= MAX_RETRIES:
+                            logger.warning(
+                                "Empty LLM output, retrying with repair prompt",
+                                extra={"run_id": run_id, "step": index + 1, "action": action, "attempt": attempt},
+                            )
+                            step_span.add_event("retry", attempt=attempt)
+                            yield {"step": index + 1, "status": "retrying", "reason": "empty output"}
+                            prompt = (
+                                f"The previous attempt returned an empty response. "
+                                f"Please try again carefully.\n\n{prompt}"
+                            )
                 
-                # Save Step (even if output is empty after retries)
-                step_run = WorkflowStepRun(
-                    workflow_run_id=db_run.id,
-                    step_order=index + 1,
-                    step_type=action,
-                    output_text=step_output
-                )
-                db.add(step_run)
-                db.commit()
+                    if cached_output is None:
+                        step_cache.put(action, model, current_input, step_output)
+
+                    # Save Step (even if output is empty after retries)
+                    with trace.span("db.save_step"), session_scope() as session:
+                        session.add(WorkflowStepRun(
+                            workflow_run_id=run_pk,
+                            step_order=index + 1,
+                            step_type=action,
+                            output_text=step_output,
+                            prompt_tokens=prompt_tokens,
+                            completion_tokens=completion_tokens,
+                        ))
+                        session.query(WorkflowRun).filter(WorkflowRun.id == run_pk).update({
+                            WorkflowRun.prompt_tokens: func.coalesce(WorkflowRun.prompt_tokens, 0) + prompt_tokens,
+                            WorkflowRun.completion_tokens: func.coalesce(WorkflowRun.completion_tokens, 0) + completion_tokens,
+                        }, synchronize_session=False)
+                    reservation.settle(prompt_tokens + completion_tokens)
+                    run_prompt_tokens += prompt_tokens
+                    run_completion_tokens += completion_tokens
+                    step_span.set("llm.prompt_tokens", prompt_tokens)
+                    step_span.set("llm.completion_tokens", completion_tokens)
+                    step_span.set("step.attempts", attempt + 1)
                 
-                # Validate step output with Pydantic before passing to next step
-                validated = LLMStepOutput(
-                    content=step_output,
-                    step_order=index + 1,
-                    action=action,
-                )
-
-                logger.info(
-                    "Step completed",
-                    extra={"run_id": run_id, "step": index + 1, "action": action, "attempts": attempt + 1},
-                )
+                    # Validate step output with Pydantic before passing to next step
+                    validated = LLMStepOutput(
+                        content=step_output,
+                        step_order=index + 1,
+                        action=action,
+                    )
+
+                    logger.info(
+                        "Step completed",
+                        extra={
+                            "run_id": run_id, "step": index + 1, "action": action, "attempts": attempt + 1,
+                            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                        },
+                    )
                 
-                current_input = validated.content
-                yield json.dumps({"step": index + 1, "status": "completed", "final_output": validated.content}) + "\n"
+                    current_input = validated.content
+                    yield {
+                        "step": index + 1,
+                        "status": "completed",
+                        "final_output": validated.content,
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+                    }
             
             # Complete Run
-            db_run.status = "completed"
-            db.commit()
+            with trace.span("db.set_status"):
+                _set_run_status(run_pk, "completed")
             logger.info("Workflow run completed", extra={"run_id": run_id})
             
-            yield json.dumps({"status": "workflow_completed", "run_id": run_id}) + "\n"
+            yield {
+                "status": "workflow_completed",
+                "run_id": run_id,
+                "usage": {"prompt_tokens": run_prompt_tokens, "completion_tokens": run_completion_tokens},
+            }
             
         except Exception:
             logger.error(
@@ -168,10 +432,23 @@ def run_workflow_stream(workflow_id: str, run_request: WorkflowRunCreate, reques
                 extra={"run_id": run_id},
                 exc_info=True,
             )
-            db_run.status = "failed"
-            db.commit()
-            yield json.dumps({"error": "Workflow execution failed. Please try again."}) + "\n"
+            with trace.span("db.set_status"):
+                _set_run_status(run_pk, "failed")
+            yield RUN_FAILED_EVENT
+
+    run_executor.submit(
+        _publish_run, run_id,
+        _admitted_events(ticket, trace, profile, run_pk, coherent_generator(), reservation),
+    )
+
+    async def ndjson_stream():
+        async for _event_id, event in event_bus.subscribe(run_id, create=True):
+            yield json.dumps(event) + "\n"
 
-    return StreamingResponse(coherent_generator(), media_type="application/x-ndjson")
+    return StreamingResponse(
+        ndjson_stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Run-Id": run_id},
+    )
 
 
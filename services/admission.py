@@ -0,0 +1,189 @@
+"""
+Admission control for streaming runs.
+
+Each run needs an execution slot. When every slot is busy, runs wait in a
+bounded priority queue with a deadline instead of piling up on the
+threadpool and DB pool. Requests that cannot be served in time are shed
+straight away with a `Retry-After` hint:
+
+- the queue (or, for low priority, half of it) is full,
+- the predicted queue wait exceeds the deadline, or
+- upstream LLM latency is above the SLO (high priority is exempt).
+
+Only running requests refresh the latency signal, so it expires after
+`latency_ttl` seconds, and when nothing is in flight one run is let
+through as a probe; otherwise shedding could never recover.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Optional
+
+from core.config import settings
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+# Smoothing factor for the moving averages
+EWMA_ALPHA = 0.2
+# Age after which the upstream latency signal is ignored
+LATENCY_SIGNAL_TTL_SECONDS = 30.0
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    if current is None:
+        return sample
+    return EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * current
+
+
+class AdmissionTicket:
+    def __init__(self, controller: "AdmissionController", rank: int):
+        self.controller = controller
+        self.rank = rank
+        self.granted = False
+        self.released = False
+        self.queued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+
+    def wait(self) -> bool:
+        """Block until a slot is granted. Returns False if the queue deadline passed."""
+        return self.controller._wait(self)
+
+    def release(self) -> None:
+        self.controller._release(self)
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float,
+                 latency_slo_ms: float = 0, latency_ttl: float = LATENCY_SIGNAL_TTL_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.latency_slo_ms = latency_slo_ms
+        self.latency_ttl = latency_ttl
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = []  # heap of (rank, seq, ticket)
+        self._seq = itertools.count()
+        self.llm_latency_ms: Optional[float] = None
+        self.llm_latency_at: Optional[float] = None
+        self.queue_wait_ms: Optional[float] = None
+        self.run_seconds: Optional[float] = None
+        self.rejected = 0
+
+    def _retry_after(self, queued: int) -> int:
+        per_run = self.run_seconds or 1.0
+        estimate = per_run * (queued + 1) / max(self.max_concurrent, 1)
+        return min(max(math.ceil(estimate), 1), 60)
+
+    def _shed(self, reason: str, queued: int) -> Overloaded:
+        self.rejected += 1
+        return Overloaded(reason, self._retry_after(queued))
+
+    def admit(self, priority: str = "normal") -> AdmissionTicket:
+        """Grant a slot, queue the run, or raise Overloaded. Never blocks."""
+        rank = PRIORITIES.get(priority, PRIORITIES["normal"])
+        with self._cond:
+            queued = len(self._waiting)
+            if rank > PRIORITIES["high"] and self._latency_above_slo():
+                raise self._shed("Upstream latency above SLO", queued)
+
+            ticket = AdmissionTicket(self, rank)
+            if self._in_flight < self.max_concurrent and not self._waiting:
+                self._grant(ticket)
+                return ticket
+
+            limit = self.max_queued if rank < PRIORITIES["low"] else self.max_queued // 2
+            if queued >= limit:
+                raise self._shed("Run queue is full", queued)
+            if self.run_seconds is not None:
+                expected_wait = self.run_seconds * (queued + 1) / max(self.max_concurrent, 1)
+                if expected_wait > self.queue_timeout:
+                    raise self._shed("Expected queue wait exceeds deadline", queued)
+
+            heapq.heappush(self._waiting, (rank, next(self._seq), ticket))
+            return ticket
+
+    def _latency_above_slo(self) -> bool:
+        if not self.latency_slo_ms or self.llm_latency_ms is None:
+            return False
+        if time.monotonic() - self.llm_latency_at > self.latency_ttl:
+            # Stale: no run has reported in a while, start over
+            self.llm_latency_ms = None
+            return False
+        # With nothing in flight the signal cannot refresh; admit a probe
+        return self._in_flight > 0 and self.llm_latency_ms > self.latency_slo_ms
+
+    def _grant(self, ticket: AdmissionTicket) -> None:
+        ticket.granted = True
+        ticket.started_at = time.monotonic()
+        self._in_flight += 1
+        wait_ms = (ticket.started_at - ticket.queued_at) * 1000
+        self.queue_wait_ms = _ewma(self.queue_wait_ms, wait_ms)
+
+    def _grant_waiting(self) -> None:
+        while self._waiting and self._in_flight < self.max_concurrent:
+            _, _, ticket = heapq.heappop(self._waiting)
+            self._grant(ticket)
+        self._cond.notify_all()
+
+    def _wait(self, ticket: AdmissionTicket) -> bool:
+        deadline = ticket.queued_at + self.queue_timeout
+        with self._cond:
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting = [item for item in self._waiting if item[2] is not ticket]
+                    heapq.heapify(self._waiting)
+                    ticket.released = True
+                    self.rejected += 1
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        with self._cond:
+            if ticket.released:
+                return
+            ticket.released = True
+            if not ticket.granted:
+                self._waiting = [item for item in self._waiting if item[2] is not ticket]
+                heapq.heapify(self._waiting)
+                return
+            self._in_flight -= 1
+            self.run_seconds = _ewma(self.run_seconds, time.monotonic() - ticket.started_at)
+            self._grant_waiting()
+
+    def record_llm_latency(self, seconds: float) -> None:
+        """Record upstream time to first token."""
+        with self._cond:
+            self.llm_latency_ms = _ewma(self.llm_latency_ms, seconds * 1000)
+            self.llm_latency_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "queued": len(self._waiting),
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+                "llm_latency_ms": round(self.llm_latency_ms, 1) if self.llm_latency_ms is not None else None,
+                "queue_wait_ms": round(self.queue_wait_ms, 1) if self.queue_wait_ms is not None else None,
+                "rejected": self.rejected,
+            }
+
+
+admission = AdmissionController(
+    max_concurrent=settings.MAX_CONCURRENT_RUNS,
+    max_queued=settings.MAX_QUEUED_RUNS,
+    queue_timeout=settings.RUN_QUEUE_TIMEOUT_SECONDS,
+    latency_slo_ms=settings.LLM_LATENCY_SLO_MS,
+)
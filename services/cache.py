@@ -0,0 +1,198 @@
+"""
+Near-duplicate cache for LLM step outputs.
+
+Inputs are normalized (case, whitespace, punctuation) and reduced to a
+MinHash signature over word shingles. Signatures are bucketed with
+locality-sensitive hashing, so a lookup only compares against entries
+that share at least one band, and a hit requires the estimated Jaccard
+similarity to reach the action's threshold.
+
+Only idempotent actions listed in `SEMANTIC_CACHE_THRESHOLDS` are cached;
+generative ones (summaries, analogies) always go to the LLM.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from core.config import settings
+
+_WORD_RE = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text: str) -> List[str]:
+    """Lowercase word tokens, ignoring whitespace and punctuation differences."""
+    return _WORD_RE.findall(text.lower())
+
+
+def parse_thresholds(spec: str) -> Dict[str, float]:
+    """Parse "classify:0.9,tone:0.85" into {"classify": 0.9, "tone": 0.85}."""
+    thresholds = {}
+    for item in spec.split(","):
+        if ":" not in item:
+            continue
+        action, value = item.split(":", 1)
+        thresholds[action.strip()] = float(value)
+    return thresholds
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, tokens: List[str]) -> tuple:
+        if len(tokens) > 1:
+            shingles = {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+        else:
+            shingles = set(tokens)
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little")
+            for s in shingles
+        ]
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+
+def estimate_similarity(sig_a: tuple, sig_b: tuple) -> float:
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class _Entry:
+    __slots__ = ("key", "action", "signature", "output", "expires_at", "bands")
+
+    def __init__(self, key, action, signature, output, expires_at, bands):
+        self.key = key
+        self.action = action
+        self.signature = signature
+        self.output = output
+        self.expires_at = expires_at
+        self.bands = bands
+
+
+class SemanticCache:
+    """
+    Thread-safe LRU cache of step outputs keyed by input similarity.
+    `bands * rows` must equal the MinHash permutation count.
+    """
+
+    def __init__(self, thresholds: Dict[str, float], max_entries: int = 2048,
+                 ttl_seconds: float = 3600, bands: int = 16, rows: int = 4):
+        self.thresholds = thresholds
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bands = bands
+        self.rows = rows
+        self._hasher = MinHasher(num_perm=bands * rows)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: Dict[tuple, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def is_cacheable(self, action: str) -> bool:
+        return action in self.thresholds
+
+    def _key(self, action: str, model: str, tokens: List[str]) -> str:
+        digest = hashlib.sha256(" ".join(tokens).encode()).hexdigest()
+        return f"{model}:{action}:{digest}"
+
+    def _band_keys(self, action: str, model: str, signature: tuple) -> List[tuple]:
+        return [
+            (model, action, i, signature[i * self.rows:(i + 1) * self.rows])
+            for i in range(self.bands)
+        ]
+
+    def _remove(self, entry: _Entry) -> None:
+        self._entries.pop(entry.key, None)
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(entry.key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def get(self, action: str, model: str, text: str) -> Optional[str]:
+        if not self.is_cacheable(action):
+            return None
+        tokens = normalize_text(text)
+        key = self._key(action, model, tokens)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._hit(entry):
+                return entry.output
+
+        # MinHash and similarity scoring are pure Python and slow for long
+        # inputs, so only the bucket lookup holds the lock.
+        signature = self._hasher.signature(tokens)
+        bands = self._band_keys(action, model, signature)
+        with self._lock:
+            candidates = {self._entries[k] for band in bands for k in self._buckets.get(band, ())}
+        entry, best_score = None, self.thresholds[action]
+        for candidate in candidates:
+            score = estimate_similarity(signature, candidate.signature)
+            if score >= best_score:
+                entry, best_score = candidate, score
+
+        with self._lock:
+            # The entry may have been evicted or replaced while unlocked
+            if entry is not None and self._entries.get(entry.key) is entry and self._hit(entry):
+                return entry.output
+            self.misses += 1
+            return None
+
+    def _hit(self, entry: _Entry) -> bool:
+        """Count a hit on a live entry; drop it if expired. Caller holds the lock."""
+        if entry.expires_at <= time.monotonic():
+            self._remove(entry)
+            return False
+        self._entries.move_to_end(entry.key)
+        self.hits += 1
+        return True
+
+    def put(self, action: str, model: str, text: str, output: str) -> None:
+        if not self.is_cacheable(action) or not output.strip():
+            return
+        tokens = normalize_text(text)
+        key = self._key(action, model, tokens)
+        signature = self._hasher.signature(tokens)
+        bands = self._band_keys(action, model, signature)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._remove(existing)
+            self._entries[key] = _Entry(key, action, signature, output, time.monotonic() + self.ttl_seconds, bands)
+            for band in bands:
+                self._buckets.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries.values())))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+step_cache = SemanticCache(
+    thresholds=parse_thresholds(settings.SEMANTIC_CACHE_THRESHOLDS) if settings.SEMANTIC_CACHE_ENABLED else {},
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,229 @@
+"""
+Run progress event bus.
+
+Workflow runs publish their progress events (step started, chunks, step
+completed, workflow completed / error) to the bus. Any number of clients
+can subscribe to a run and replay what they missed by event id, so the
+NDJSON, SSE and WebSocket transports all share a single LLM execution.
+
+Publishing happens from worker threads; subscribers are asyncio consumers.
+The backend is pluggable: `InMemoryEventBackend` serves a single process,
+`RedisEventBackend` shares runs between workers through Redis streams.
+"""
+
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Optional, Tuple
+
+from core.config import settings
+
+
+class RunNotFound(Exception):
+    """Raised when subscribing to a run the backend does not (or no longer) hold."""
+
+
+class EventBackend:
+    """Interface for event storage and fan-out. Subclass for shared backends."""
+
+    def publish(self, run_id: str, event: dict, final: bool = False) -> int:
+        raise NotImplementedError
+
+    def subscribe(self, run_id: str, after_id: int = 0, heartbeat: Optional[float] = None,
+                  create: bool = False) -> AsyncIterator[Optional[Tuple[int, dict]]]:
+        raise NotImplementedError
+
+    def has_run(self, run_id: str) -> bool:
+        raise NotImplementedError
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def deliver(self, item) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+
+class _RunLog:
+    def __init__(self):
+        self.events = []  # list of (event_id, event)
+        self.finished = False
+        self.subscribers = set()
+
+
+class InMemoryEventBackend(EventBackend):
+    """
+    Keeps the full event log of the most recent runs in process memory.
+    Finished runs beyond `max_runs` are evicted oldest first.
+    """
+
+    def __init__(self, max_runs: int = 500):
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, _RunLog]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self) -> None:
+        if len(self._runs) <= self.max_runs:
+            return
+        for run_id in list(self._runs):
+            if len(self._runs) <= self.max_runs:
+                break
+            log = self._runs[run_id]
+            if log.finished and not log.subscribers:
+                del self._runs[run_id]
+
+    def publish(self, run_id: str, event: dict, final: bool = False) -> int:
+        with self._lock:
+            log = self._runs.get(run_id)
+            if log is None:
+                log = self._runs[run_id] = _RunLog()
+                self._evict()
+            if log.finished:
+                return len(log.events)
+            event_id = len(log.events) + 1
+            log.events.append((event_id, event))
+            log.finished = final
+            for subscriber in log.subscribers:
+                subscriber.deliver((event_id, event, final))
+            return event_id
+
+    def has_run(self, run_id: str) -> bool:
+        with self._lock:
+            return run_id in self._runs
+
+    async def subscribe(self, run_id: str, after_id: int = 0, heartbeat: Optional[float] = None,
+                        create: bool = False):
+        """
+        Yield `(event_id, event)` for every event after `after_id`, replaying
+        history first, until the run's final event. Yields `None` when no
+        event arrived within `heartbeat` seconds so transports can keep
+        idle connections alive.
+
+        Raises RunNotFound for unknown runs unless `create` is set, which the
+        run's own stream uses to subscribe before its first event.
+        """
+        subscriber = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            log = self._runs.get(run_id)
+            if log is None:
+                if not create:
+                    raise RunNotFound(run_id)
+                log = self._runs[run_id] = _RunLog()
+                self._evict()
+            backlog = [item for item in log.events if item[0] > after_id]
+            finished = log.finished
+            if not finished:
+                log.subscribers.add(subscriber)
+
+        try:
+            for item in backlog:
+                yield item
+            if finished:
+                return
+            last_id = backlog[-1][0] if backlog else after_id
+            while True:
+                try:
+                    event_id, event, final = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event_id <= last_id:
+                    continue
+                last_id = event_id
+                yield event_id, event
+                if final:
+                    return
+        finally:
+            with self._lock:
+                log.subscribers.discard(subscriber)
+
+
+class RedisEventBackend(EventBackend):
+    """
+    One Redis stream per run. Entry ids are "<event_id>-1", so the numeric
+    event id used for replay maps directly onto stream positions. Streams
+    expire `ttl_seconds` after a run's last event.
+    """
+
+    def __init__(self, url: str, ttl_seconds: int = 3600, client=None, async_client_factory=None):
+        if client is None or async_client_factory is None:
+            import redis
+            import redis.asyncio
+            client = client or redis.Redis.from_url(url, decode_responses=True)
+            async_client_factory = async_client_factory or (
+                lambda: redis.asyncio.Redis.from_url(url, decode_responses=True)
+            )
+        self.client = client
+        self.async_client_factory = async_client_factory
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _stream_key(run_id: str) -> str:
+        return f"run_events:{run_id}"
+
+    @staticmethod
+    def _seq_key(run_id: str) -> str:
+        return f"run_events_seq:{run_id}"
+
+    def publish(self, run_id: str, event: dict, final: bool = False) -> int:
+        event_id = self.client.incr(self._seq_key(run_id))
+        pipe = self.client.pipeline()
+        pipe.xadd(self._stream_key(run_id), {"data": json.dumps(event), "final": int(final)}, id=f"{event_id}-1")
+        # Refreshed on every event so streams of crashed runs expire too
+        pipe.expire(self._stream_key(run_id), self.ttl_seconds)
+        pipe.expire(self._seq_key(run_id), self.ttl_seconds)
+        pipe.execute()
+        return event_id
+
+    def has_run(self, run_id: str) -> bool:
+        return bool(self.client.exists(self._seq_key(run_id)))
+
+    async def subscribe(self, run_id: str, after_id: int = 0, heartbeat: Optional[float] = None,
+                        create: bool = False):
+        key = self._stream_key(run_id)
+        last = f"{after_id}-1" if after_id else "0-0"
+        block_ms = int(heartbeat * 1000) if heartbeat else 0
+        client = self.async_client_factory()
+        try:
+            if not create and not await client.exists(self._seq_key(run_id)):
+                raise RunNotFound(run_id)
+            while True:
+                response = await client.xread({key: last}, count=100, block=block_ms)
+                if not response:
+                    yield None
+                    continue
+                for entry_id, fields in response[0][1]:
+                    last = entry_id
+                    yield int(entry_id.split("-")[0]), json.loads(fields["data"])
+                    if fields.get("final") == "1":
+                        return
+        finally:
+            await client.aclose()
+
+
+class EventBus:
+    def __init__(self, backend: EventBackend):
+        self.backend = backend
+
+    def publish(self, run_id: str, event: dict, final: bool = False) -> int:
+        return self.backend.publish(run_id, event, final=final)
+
+    def subscribe(self, run_id: str, after_id: int = 0, heartbeat: Optional[float] = None, create: bool = False):
+        return self.backend.subscribe(run_id, after_id=after_id, heartbeat=heartbeat, create=create)
+
+    def has_run(self, run_id: str) -> bool:
+        return self.backend.has_run(run_id)
+
+
+def _create_backend() -> EventBackend:
+    if settings.EVENT_BACKEND == "memory":
+        return InMemoryEventBackend(max_runs=settings.EVENT_HISTORY_RUNS)
+    if settings.EVENT_BACKEND == "redis":
+        return RedisEventBackend(settings.SHARED_STATE_URL)
+    raise ValueError(f"Unknown EVENT_BACKEND '{settings.EVENT_BACKEND}'")
+
+
+event_bus = EventBus(_create_backend())
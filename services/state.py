@@ -0,0 +1,104 @@
+"""
+Shared state backends for multi-worker deployments.
+
+With a single worker everything can live in process memory. With several
+gunicorn/uvicorn workers (or nodes) state that other workers need to see
+— run events, trace timelines, rate-limit counters — goes to a shared
+backend selected by `SHARED_STATE_URL`:
+
+- unset: `LocalStateBackend`, an in-process stand-in for development
+  and single-worker deployments
+- redis://...: `RedisStateBackend` (requires the `redis` package)
+"""
+
+import json
+import threading
+import time
+from typing import Optional
+
+from core.config import settings
+
+
+class StateBackend:
+    """Minimal JSON key/value interface with expiry."""
+
+    shared = False
+
+    def get_json(self, key: str):
+        raise NotImplementedError
+
+    def set_json(self, key: str, value, ttl_seconds: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int, ttl_seconds: Optional[float] = None) -> int:
+        """Atomically add `amount` to an integer counter and return the new value."""
+        raise NotImplementedError
+
+
+class LocalStateBackend(StateBackend):
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get_json(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return json.loads(value)
+
+    def set_json(self, key: str, value, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._data[key] = (json.dumps(value), expires_at)
+
+    def incr(self, key: str, amount: int, ttl_seconds: Optional[float] = None) -> int:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            current = 0
+            if item is not None and (item[1] is None or item[1] > now):
+                current = json.loads(item[0])
+            value = current + amount
+            self._data[key] = (json.dumps(value), now + ttl_seconds if ttl_seconds else None)
+            return value
+
+
+class RedisStateBackend(StateBackend):
+    shared = True
+
+    def __init__(self, url: str, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.url = url
+        self.client = client
+
+    def get_json(self, key: str):
+        value = self.client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, key: str, value, ttl_seconds: Optional[float] = None) -> None:
+        self.client.set(key, json.dumps(value), ex=int(ttl_seconds) if ttl_seconds else None)
+
+    def incr(self, key: str, amount: int, ttl_seconds: Optional[float] = None) -> int:
+        pipe = self.client.pipeline()
+        pipe.incrby(key, amount)
+        if ttl_seconds:
+            pipe.expire(key, int(ttl_seconds))
+        return pipe.execute()[0]
+
+
+def create_state_backend(url: Optional[str]) -> StateBackend:
+    if not url:
+        return LocalStateBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateBackend(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL scheme: {url}")
+
+
+shared_state = create_state_backend(settings.SHARED_STATE_URL)
@@ -0,0 +1,85 @@
+"""
+Templates materialized as canonical workflows, and content-hash dedupe.
+
+Every template version is stored once as an immutable `Workflow` row, so
+templates can be run directly without inserting a definition per run.
+User-created workflows with an identical definition (name, description
+and steps) resolve to the existing row instead of a new one.
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from core.templates import PREDEFINED_TEMPLATES
+from db.database import Workflow
+
+# template key -> workflow id of its current version, filled at startup
+template_workflow_ids: Dict[str, UUID] = {}
+
+
+def definition_hash(name: str, description: Optional[str], steps: List[dict]) -> str:
+    canonical = json.dumps(
+        {"name": name, "description": description, "steps": steps},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def template_steps(template: dict) -> List[dict]:
+    return [{"action": action, "params": {}} for action in template["steps"]]
+
+
+def find_by_hash(db: Session, content_hash: str) -> Optional[Workflow]:
+    return (
+        db.query(Workflow)
+        .filter(Workflow.content_hash == content_hash)
+        .order_by(Workflow.created_at)
+        .first()
+    )
+
+
+def seed_templates(conn) -> None:
+    """Insert any template version not yet in the DB. Run from `init_db`."""
+    with Session(bind=conn) as db:
+        for key, template in PREDEFINED_TEMPLATES.items():
+            version = template.get("version", 1)
+            workflow = (
+                db.query(Workflow)
+                .filter(Workflow.template_key == key, Workflow.template_version == version)
+                .first()
+            )
+            if workflow is None:
+                steps = template_steps(template)
+                workflow = Workflow(
+                    name=template["label"],
+                    description=template["description"],
+                    steps=steps,
+                    content_hash=definition_hash(template["label"], template["description"], steps),
+                    template_key=key,
+                    template_version=version,
+                )
+                db.add(workflow)
+                db.flush()
+            template_workflow_ids[key] = workflow.id
+        db.commit()
+
+
+def get_template_workflow_id(db: Session, key: str) -> Optional[UUID]:
+    workflow_id = template_workflow_ids.get(key)
+    if workflow_id is not None or key not in PREDEFINED_TEMPLATES:
+        return workflow_id
+    version = PREDEFINED_TEMPLATES[key].get("version", 1)
+    workflow = (
+        db.query(Workflow)
+        .filter(Workflow.template_key == key, Workflow.template_version == version)
+        .first()
+    )
+    if workflow is not None:
+        template_workflow_ids[key] = workflow.id
+        return workflow.id
+    return None
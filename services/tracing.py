@@ -0,0 +1,330 @@
+"""
+Per-run execution traces.
+
+A trace is a tree of timed spans (DB operations, prompt building, LLM
+requests with first/last token events, retries) recorded while a run
+executes. Recent traces are kept in memory for `GET /runs/{id}/trace`
+and, when configured, exported in OpenTelemetry's OTLP/JSON format to a
+local file and/or an OTLP/HTTP collector.
+
+Runs can also be profiled: with a valid admin token the run executes
+under pyinstrument (sampling) when installed, otherwise cProfile.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+from core.config import settings
+from core.logging_config import get_logger
+from services.state import shared_state
+
+try:
+    from pyinstrument import Profiler as _SamplingProfiler
+except ImportError:  # optional dependency
+    _SamplingProfiler = None
+
+logger = get_logger(__name__)
+
+SERVICE_NAME = "workflow-builder"
+
+
+def admin_authorized(request) -> bool:
+    """True when the request carries the configured admin token."""
+    token = request.headers.get("x-admin-token")
+    return bool(settings.ADMIN_TOKEN and token and hmac.compare_digest(token, settings.ADMIN_TOKEN))
+
+
+def _new_id(num_bytes: int) -> str:
+    return os.urandom(num_bytes).hex()
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "events", "_lock")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: dict, lock: threading.Lock):
+        self.name = name
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.events = []
+        self._lock = lock
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        with self._lock:
+            self.events.append((name, time.time_ns(), attributes))
+
+
+class RunTrace:
+    """
+    Spans of a single run. Recorded from one thread at a time (request, then
+    executor), but `timeline()` may be read concurrently by
+    `GET /runs/{id}/trace`, so changes go through a per-trace lock.
+    """
+
+    sampled = True
+
+    def __init__(self, **attributes):
+        self.trace_id = _new_id(16)
+        self.run_id: Optional[str] = None
+        self.spans = []
+        self.profile: Optional[str] = None
+        self._stack = []
+        self._lock = threading.Lock()
+        self.root = self._open("run", attributes)
+
+    def _open(self, name: str, attributes: dict) -> Span:
+        parent_id = self._stack[-1].span_id if self._stack else None
+        span = Span(name, parent_id, attributes, self._lock)
+        with self._lock:
+            self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def _close(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        if span in self._stack:
+            self._stack.remove(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        span = self._open(name, attributes)
+        try:
+            yield span
+        except BaseException as exc:
+            span.set("error", type(exc).__name__)
+            raise
+        finally:
+            self._close(span)
+
+    def finish(self, status: str) -> None:
+        self.root.set("run.status", status)
+        with self._lock:
+            for span in reversed(self.spans):
+                if span.end_ns is None:
+                    span.end_ns = time.time_ns()
+        self._stack.clear()
+
+    def timeline(self) -> dict:
+        """Snapshot of the trace; safe to call while the run is still recording."""
+        with self._lock:
+            return self._timeline()
+
+    def _timeline(self) -> dict:
+        origin = self.root.start_ns
+        end = self.root.end_ns or time.time_ns()
+        return {
+            "run_id": self.run_id,
+            "trace_id": self.trace_id,
+            "duration_ms": round((end - origin) / 1e6, 3),
+            "spans": [
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "start_ms": round((span.start_ns - origin) / 1e6, 3),
+                    "duration_ms": round(((span.end_ns or end) - span.start_ns) / 1e6, 3),
+                    "attributes": dict(span.attributes),
+                    "events": [
+                        {"name": name, "offset_ms": round((ts - origin) / 1e6, 3), **attrs}
+                        for name, ts, attrs in span.events
+                    ],
+                }
+                for span in self.spans
+            ],
+        }
+
+    def to_otlp(self) -> dict:
+        """OTLP/JSON `ExportTraceServiceRequest` body."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": SERVICE_NAME},
+                    "spans": [
+                        {
+                            "traceId": self.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_id or "",
+                            "name": span.name,
+                            "kind": 1,
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                            "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                            "events": [
+                                {
+                                    "name": name,
+                                    "timeUnixNano": str(ts),
+                                    "attributes": [_otlp_attribute(k, v) for k, v in attrs.items()],
+                                }
+                                for name, ts, attrs in span.events
+                            ],
+                        }
+                        for span in self.spans
+                    ],
+                }],
+            }],
+        }
+
+
+class _NoopSpan:
+    def set(self, key, value):
+        pass
+
+    def add_event(self, name, **attributes):
+        pass
+
+
+class NoopTrace:
+    """Stand-in for unsampled runs so call sites need no sampling checks."""
+
+    sampled = False
+    run_id = None
+    profile = None
+    _span = _NoopSpan()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        yield self._span
+
+    def finish(self, status: str) -> None:
+        pass
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class RunProfiler:
+    """Profiles the current thread; sampling via pyinstrument when available."""
+
+    def __init__(self):
+        if _SamplingProfiler is not None:
+            self._profiler = _SamplingProfiler()
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self) -> None:
+        if _SamplingProfiler is not None:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self) -> str:
+        if _SamplingProfiler is not None:
+            self._profiler.stop()
+            return self._profiler.output_text()
+        self._profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        return out.getvalue()
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 1.0, max_traces: int = 200,
+                 export_path: Optional[str] = None, collector_url: Optional[str] = None,
+                 state=None, shared_ttl_seconds: int = 3600):
+        self.sample_rate = sample_rate
+        self.state = state
+        self.shared_ttl_seconds = shared_ttl_seconds
+        self.max_traces = max_traces
+        self.export_path = export_path
+        self.collector_url = collector_url
+        self._traces: "OrderedDict[str, RunTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+
+    def start_run(self, force: bool = False, **attributes):
+        if force or random.random() < self.sample_rate:
+            return RunTrace(**attributes)
+        return NoopTrace()
+
+    def register(self, run_id: str, trace) -> None:
+        if not trace.sampled:
+            return
+        trace.run_id = run_id
+        trace.root.set("run.id", run_id)
+        with self._lock:
+            self._traces[run_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+
+    def get_timeline(self, run_id: str) -> Optional[dict]:
+        """
+        Timeline of a recent run, including its profile if one was taken.
+        Falls back to the shared state backend for runs traced by other workers.
+        """
+        with self._lock:
+            trace = self._traces.get(run_id)
+        if trace is not None:
+            timeline = trace.timeline()
+            timeline["profile"] = trace.profile
+            return timeline
+        if self.state is not None and self.state.shared:
+            return self.state.get_json(f"trace:{run_id}")
+        return None
+
+    def finish(self, trace, status: str) -> None:
+        """Close the trace and export it off the run's thread."""
+        if not trace.sampled:
+            return
+        trace.finish(status)
+        if self.export_path or self.collector_url or (self.state is not None and self.state.shared):
+            self._exporter.submit(self._export, trace)
+
+    def _export(self, trace: RunTrace) -> None:
+        try:
+            if self.state is not None and self.state.shared:
+                timeline = trace.timeline()
+                timeline["profile"] = trace.profile
+                self.state.set_json(f"trace:{trace.run_id}", timeline, ttl_seconds=self.shared_ttl_seconds)
+            if not (self.export_path or self.collector_url):
+                return
+            payload = json.dumps(trace.to_otlp())
+            if self.export_path:
+                with open(self.export_path, "a", encoding="utf-8") as f:
+                    f.write(payload + "\n")
+            if self.collector_url:
+                request = urllib.request.Request(
+                    self.collector_url,
+                    data=payload.encode(),
+                    headers={"Content-Type": "application/json"},
+                    method="POST",
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+        except Exception:
+            logger.warning("Trace export failed", extra={"run_id": trace.run_id}, exc_info=True)
+
+
+tracer = Tracer(
+    sample_rate=settings.TRACE_SAMPLE_RATE,
+    max_traces=settings.TRACE_HISTORY_RUNS,
+    export_path=settings.TRACE_EXPORT_PATH,
+    collector_url=settings.TRACE_COLLECTOR_URL,
+    state=shared_state,
+)
@@ -0,0 +1,152 @@
+"""
+Token accounting and budget enforcement.
+
+Token counts come from the provider's usage fields when the stream
+reports them, otherwise from a local estimate. Budgets are checked
+before a run starts using a prediction based on the prompt templates,
+the input size and an expected completion size per step.
+
+Runs only write their usage as steps complete, so the per-key daily
+budget also counts tokens reserved by runs still in flight; otherwise
+concurrent runs would each pass the check. Reservations live in the
+shared state backend so they are seen by every worker.
+"""
+
+import hashlib
+import math
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.prompts import PROMPTS
+from db.database import WorkflowRun
+from services.state import shared_state
+
+# Rough average for English text with Llama-family tokenizers
+CHARS_PER_TOKEN = 4
+# Identity used for runs on the server's own API key
+SERVER_KEY_ID = "server"
+# Reservations of crashed workers expire after this long without updates
+RESERVATION_TTL_SECONDS = 3600
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def api_key_id(api_key: Optional[str]) -> str:
+    """Stable, non-reversible identifier for a client API key."""
+    if not api_key:
+        return SERVER_KEY_ID
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def extract_usage(chunk) -> Optional[Tuple[int, int]]:
+    """(prompt_tokens, completion_tokens) from a stream chunk, if it carries usage."""
+    usage = getattr(chunk, "usage", None)
+    if usage is None:
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+    if usage is None:
+        return None
+    return (getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+
+
+def predict_run_tokens(steps: List[dict], input_text: str) -> int:
+    """
+    Upper-bound style estimate of a run's total tokens: each step pays for
+    its prompt template, its input (the previous step's output) and its
+    own completion.
+    """
+    total = 0
+    carry = estimate_tokens(input_text)
+    for step in steps:
+        template = PROMPTS.get(step.get("action"), "")
+        completion = settings.EXPECTED_COMPLETION_TOKENS
+        total += estimate_tokens(template) + carry + completion
+        carry = completion
+    return total
+
+
+def tokens_used_today(db: Session, key_id: str) -> int:
+    start_of_day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    used = (
+        db.query(func.sum(func.coalesce(WorkflowRun.prompt_tokens, 0) + func.coalesce(WorkflowRun.completion_tokens, 0)))
+        .filter(WorkflowRun.api_key_id == key_id, WorkflowRun.created_at >= start_of_day)
+        .scalar()
+    )
+    return used or 0
+
+
+class TokenReservation:
+    """Tokens held for an in-flight run until its real usage is recorded."""
+
+    def __init__(self, ledger: "TokenLedger", key_id: str, tokens: int, others: int):
+        self.ledger = ledger
+        self.key_id = key_id
+        self.remaining = tokens
+        # Tokens reserved by the key's other in-flight runs at reservation time
+        self.others = others
+
+    def settle(self, tokens: int) -> None:
+        """Release as much of the reservation as `tokens` of usage just recorded."""
+        amount = min(tokens, self.remaining)
+        if amount > 0:
+            self.remaining -= amount
+            self.ledger._release(self.key_id, amount)
+
+    def release(self) -> None:
+        """Release whatever is left. Safe to call more than once."""
+        self.settle(self.remaining)
+
+
+class TokenLedger:
+    def __init__(self, state):
+        self.state = state
+
+    @staticmethod
+    def _key(key_id: str) -> str:
+        return f"token_reservations:{key_id}"
+
+    def reserve(self, key_id: str, tokens: int) -> TokenReservation:
+        # Only the daily budget needs reservations; skip the round trip otherwise
+        if not settings.TOKEN_BUDGET_PER_KEY_DAILY or tokens <= 0:
+            return TokenReservation(self, key_id, 0, 0)
+        total = self.state.incr(self._key(key_id), tokens, ttl_seconds=RESERVATION_TTL_SECONDS)
+        # Clamped: counters can dip below zero if one expired mid-run
+        return TokenReservation(self, key_id, tokens, max(total - tokens, 0))
+
+    def _release(self, key_id: str, tokens: int) -> None:
+        self.state.incr(self._key(key_id), -tokens, ttl_seconds=RESERVATION_TTL_SECONDS)
+
+
+def select_model(db: Session, key_id: str, predicted: int, default_model: str, reserved: int = 0) -> str:
+    """
+    Return the model a run should use given its predicted token count and
+    the tokens `reserved` by the key's other in-flight runs. Over-budget
+    runs fall back to BUDGET_DOWNGRADE_MODEL when configured, otherwise
+    BudgetExceeded is raised.
+    """
+    over_budget = False
+    if settings.TOKEN_BUDGET_PER_RUN and predicted > settings.TOKEN_BUDGET_PER_RUN:
+        over_budget = True
+    elif settings.TOKEN_BUDGET_PER_KEY_DAILY:
+        used = tokens_used_today(db, key_id) + reserved
+        over_budget = used + predicted > settings.TOKEN_BUDGET_PER_KEY_DAILY
+
+    if not over_budget:
+        return default_model
+    if settings.BUDGET_DOWNGRADE_MODEL:
+        return settings.BUDGET_DOWNGRADE_MODEL
+    raise BudgetExceeded(f"Predicted usage of {predicted} tokens exceeds the token budget")
+
+
+token_ledger = TokenLedger(shared_state)
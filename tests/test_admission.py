@@ -0,0 +1,118 @@
+import pytest
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from services.admission import AdmissionController, Overloaded
+
+def make_controller(**kwargs):
+    options = {"max_concurrent": 1, "max_queued": 2, "queue_timeout": 5}
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+def test_admits_up_to_capacity_then_queues():
+    controller = make_controller()
+    first = controller.admit()
+    second = controller.admit()
+    assert first.granted and not second.granted
+    assert controller.stats()["queued"] == 1
+
+    first.release()
+    assert second.granted
+    assert controller.stats()["in_flight"] == 1
+
+def test_rejects_when_queue_full():
+    controller = make_controller()
+    controller.admit()
+    controller.admit()
+    controller.admit()
+    with pytest.raises(Overloaded) as exc:
+        controller.admit()
+    assert exc.value.retry_after >= 1
+
+def test_low_priority_limited_to_half_queue():
+    controller = make_controller()
+    controller.admit()
+    controller.admit("low")
+    with pytest.raises(Overloaded):
+        controller.admit("low")
+    controller.admit("high")
+
+def test_high_priority_granted_first():
+    controller = make_controller()
+    running = controller.admit()
+    low = controller.admit("normal")
+    high = controller.admit("high")
+    running.release()
+    assert high.granted and not low.granted
+
+def test_wait_times_out():
+    controller = make_controller(queue_timeout=0.05)
+    controller.admit()
+    queued = controller.admit()
+    assert queued.wait() is False
+    assert controller.stats()["queued"] == 0
+
+def test_wait_returns_when_slot_freed():
+    controller = make_controller()
+    running = controller.admit()
+    queued = controller.admit()
+    threading.Timer(0.05, running.release).start()
+    assert queued.wait() is True
+
+def test_latency_slo_sheds_non_high_priority():
+    controller = make_controller(max_concurrent=10, latency_slo_ms=100)
+    controller.record_llm_latency(0.5)
+    probe = controller.admit()
+    assert probe.granted
+    with pytest.raises(Overloaded):
+        controller.admit()
+    assert controller.admit("high").granted
+
+def test_latency_shedding_recovers_when_idle():
+    controller = make_controller(max_concurrent=10, latency_slo_ms=100)
+    controller.record_llm_latency(2.0)
+    # Nothing in flight: a probe is admitted even though the signal is high
+    probe = controller.admit()
+    with pytest.raises(Overloaded):
+        controller.admit()
+    probe.release()
+    assert controller.stats()["in_flight"] == 0
+    controller.admit().release()
+
+def test_stale_latency_signal_expires():
+    controller = make_controller(max_concurrent=10, latency_slo_ms=100, latency_ttl=0)
+    controller.admit()
+    controller.record_llm_latency(2.0)
+    assert controller.admit().granted
+    assert controller.stats()["llm_latency_ms"] is None
+
+def test_stream_returns_503_when_overloaded(monkeypatch):
+    from main import app
+    from routers import workflows
+    monkeypatch.setattr(workflows.limiter, "enabled", False)
+    monkeypatch.setattr(workflows, "admission", make_controller(max_concurrent=0, max_queued=0))
+
+    client = TestClient(app)
+    wf = client.post("/workflows", json={"name": "Busy", "steps": [{"action": "clean"}]}).json()
+    resp = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hello"})
+    assert resp.status_code == 503
+    assert int(resp.headers["retry-after"]) >= 1
+
+def test_high_priority_requires_admin(monkeypatch):
+    from starlette.requests import Request
+    from core.config import settings
+    from routers.workflows import _run_priority
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+
+    def request(**headers):
+        raw = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+        return Request({"type": "http", "headers": raw})
+
+    assert _run_priority(request(x_run_priority="high")) == "normal"
+    assert _run_priority(request(x_run_priority="high", x_admin_token="wrong")) == "normal"
+    assert _run_priority(request(x_run_priority="high", x_admin_token="secret")) == "high"
+    assert _run_priority(request(x_run_priority="low")) == "low"
+    assert _run_priority(request(x_run_priority="urgent")) == "normal"
+    assert _run_priority(request()) == "normal"
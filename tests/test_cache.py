@@ -0,0 +1,94 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.cache import SemanticCache, parse_thresholds
+
+TEXT = (
+    "Our quarterly revenue grew by twelve percent, driven by strong demand "
+    "in the enterprise segment and improved retention across all regions."
+)
+
+def make_cache(**kwargs):
+    return SemanticCache(thresholds={"classify": 0.8}, **kwargs)
+
+def test_parse_thresholds():
+    assert parse_thresholds("classify:0.9, tone:0.85") == {"classify": 0.9, "tone": 0.85}
+
+def test_exact_and_normalized_hit():
+    cache = make_cache()
+    cache.put("classify", "model", TEXT, "Finance")
+    assert cache.get("classify", "model", TEXT) == "Finance"
+    assert cache.get("classify", "model", "  " + TEXT.upper().replace(" ", "   ")) == "Finance"
+
+def test_near_duplicate_hit():
+    cache = make_cache()
+    cache.put("classify", "model", TEXT, "Finance")
+    edited = TEXT.replace("all regions", "all our regions")
+    assert cache.get("classify", "model", edited) == "Finance"
+
+def test_unrelated_text_misses():
+    cache = make_cache()
+    cache.put("classify", "model", TEXT, "Finance")
+    assert cache.get("classify", "model", "The cat sat on the mat and purred quietly all afternoon.") is None
+
+def test_non_idempotent_action_not_cached():
+    cache = make_cache()
+    cache.put("summarize", "model", TEXT, "Summary")
+    assert cache.get("summarize", "model", TEXT) is None
+
+def test_scoped_by_model():
+    cache = make_cache()
+    cache.put("classify", "model-a", TEXT, "Finance")
+    assert cache.get("classify", "model-b", TEXT) is None
+
+def test_lru_eviction():
+    cache = make_cache(max_entries=2)
+    cache.put("classify", "model", "first text about apples and pears", "A")
+    cache.put("classify", "model", "second text about cars and trucks", "B")
+    cache.put("classify", "model", "third text about oceans and rivers", "C")
+    assert cache.stats()["entries"] == 2
+    assert cache.get("classify", "model", "first text about apples and pears") is None
+
+def test_ttl_expiry():
+    cache = make_cache(ttl_seconds=-1)
+    cache.put("classify", "model", TEXT, "Finance")
+    assert cache.get("classify", "model", TEXT) is None
+
+def test_signature_computed_without_lock(monkeypatch):
+    cache = make_cache()
+    cache.put("classify", "model", TEXT, "Finance")
+    signature = cache._hasher.signature
+
+    def unlocked_signature(tokens):
+        assert not cache._lock.locked()
+        return signature(tokens)
+
+    monkeypatch.setattr(cache._hasher, "signature", unlocked_signature)
+    edited = TEXT.replace("all regions", "all our regions")
+    assert cache.get("classify", "model", edited) == "Finance"
+
+def test_stream_reuses_cached_step(monkeypatch):
+    import json
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.llm import llm_service
+    from services.cache import step_cache
+    from test_events import FakeLLMClient
+
+    calls = []
+    fake = FakeLLMClient()
+    create = fake.chat.completions.create
+    fake.chat.completions.create = lambda **kwargs: calls.append(kwargs) or create(**kwargs)
+    monkeypatch.setattr(llm_service, "get_client", lambda api_key=None: fake)
+    step_cache.clear()
+
+    client = TestClient(app)
+    wf = client.post("/workflows", json={"name": "Cached", "steps": [{"action": "classify"}]}).json()
+    first = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": TEXT})
+    second = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": TEXT.lower()})
+    assert len(calls) == 1
+    assert any(json.loads(line).get("cached") for line in second.text.splitlines())
+
+    client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": TEXT}, headers={"Cache-Control": "no-cache"})
+    assert len(calls) == 2
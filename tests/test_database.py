@@ -0,0 +1,37 @@
+import pytest
+import sys
+import os
+import uuid
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.config import settings
+from db.database import _engine_options, init_db, session_scope, get_pool_stats, SessionLocal, Workflow
+
+def test_engine_options_postgres():
+    options = _engine_options("postgresql://user:pw@localhost/db")
+    assert options["pool_size"] == settings.DB_POOL_SIZE
+    assert options["max_overflow"] == settings.DB_MAX_OVERFLOW
+    assert options["pool_timeout"] == settings.DB_POOL_TIMEOUT
+    assert options["pool_recycle"] == settings.DB_POOL_RECYCLE
+    assert options["pool_pre_ping"] == settings.DB_POOL_PRE_PING
+
+def test_engine_options_sqlite():
+    options = _engine_options("sqlite:///./test.db")
+    assert "pool_size" not in options
+    assert "pool_pre_ping" in options
+
+def test_session_scope_rolls_back_on_error():
+    init_db()
+    name = f"Rolled back {uuid.uuid4().hex}"
+    with pytest.raises(RuntimeError):
+        with session_scope() as session:
+            session.add(Workflow(name=name, steps=[]))
+            session.flush()
+            raise RuntimeError("boom")
+
+    with SessionLocal() as session:
+        assert session.query(Workflow).filter(Workflow.name == name).first() is None
+
+def test_pool_stats_shape():
+    stats = get_pool_stats()
+    assert set(stats) == {"primary", "read"}
+    assert "checked_out" in stats["primary"]
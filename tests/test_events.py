@@ -0,0 +1,128 @@
+import pytest
+import sys
+import os
+import asyncio
+import json
+import types
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from main import app
+from services.events import InMemoryEventBackend, RunNotFound, event_bus
+from routers import workflows
+from services.llm import llm_service
+
+client = TestClient(app)
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.choices = [types.SimpleNamespace(delta=types.SimpleNamespace(content=text))]
+
+
+class FakeLLMClient:
+    def __init__(self):
+        create = lambda **kwargs: iter([FakeChunk("fake "), FakeChunk("output")])
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=create))
+
+
+def test_backend_replays_after_id():
+    backend = InMemoryEventBackend()
+    backend.publish("run", {"n": 1})
+    backend.publish("run", {"n": 2})
+    backend.publish("run", {"n": 3}, final=True)
+
+    async def collect():
+        return [item async for item in backend.subscribe("run", after_id=1)]
+
+    assert asyncio.run(collect()) == [(2, {"n": 2}), (3, {"n": 3})]
+
+
+def test_backend_ignores_events_after_final():
+    backend = InMemoryEventBackend()
+    backend.publish("run", {"n": 1}, final=True)
+    backend.publish("run", {"n": 2})
+
+    async def collect():
+        return [item async for item in backend.subscribe("run")]
+
+    assert asyncio.run(collect()) == [(1, {"n": 1})]
+
+
+def test_backend_subscribe_unknown_run_raises():
+    backend = InMemoryEventBackend()
+
+    async def collect():
+        return [item async for item in backend.subscribe("missing")]
+
+    with pytest.raises(RunNotFound):
+        asyncio.run(collect())
+    assert not backend.has_run("missing")
+
+
+def test_stream_and_sse_replay(monkeypatch):
+    monkeypatch.setattr(llm_service, "get_client", lambda api_key=None: FakeLLMClient())
+    wf = client.post("/workflows", json={"name": "Events", "steps": [{"action": "clean"}]}).json()
+
+    resp = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hello"})
+    assert resp.status_code == 200
+    run_id = resp.headers["x-run-id"]
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert lines[-1]["status"] == "workflow_completed"
+    assert lines[-1]["run_id"] == run_id
+
+    sse = client.get(f"/runs/{run_id}/events", headers={"Last-Event-ID": "2"})
+    assert sse.status_code == 200
+    ids = [int(line[4:]) for line in sse.text.splitlines() if line.startswith("id: ")]
+    assert ids == list(range(3, len(lines) + 1))
+
+
+def test_sse_snapshot_ignores_last_event_id(monkeypatch):
+    monkeypatch.setattr(workflows.limiter, "enabled", False)
+    monkeypatch.setattr(llm_service, "get_client", lambda api_key=None: FakeLLMClient())
+    wf = client.post("/workflows", json={"name": "Snapshot", "steps": [{"action": "clean"}]}).json()
+    run_id = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hello"}).headers["x-run-id"]
+
+    # Simulate the run having been evicted from the bus
+    monkeypatch.setattr(event_bus, "has_run", lambda run_id: False)
+    sse = client.get(f"/runs/{run_id}/events", headers={"Last-Event-ID": "57"})
+    assert sse.status_code == 200
+    lines = sse.text.splitlines()
+    assert lines[0] == "event: snapshot"
+    assert not any(line.startswith("id: ") for line in lines)
+    events = json.loads(lines[1][len("data: "):])["events"]
+    assert events[-1] == {"status": "workflow_completed", "run_id": run_id}
+
+
+def test_sse_falls_back_to_snapshot_when_evicted_after_check(monkeypatch):
+    monkeypatch.setattr(workflows.limiter, "enabled", False)
+    monkeypatch.setattr(llm_service, "get_client", lambda api_key=None: FakeLLMClient())
+    wf = client.post("/workflows", json={"name": "Evicted", "steps": [{"action": "clean"}]}).json()
+    run_id = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hello"}).headers["x-run-id"]
+
+    # has_run() sees the run, but it is gone by the time we subscribe
+    monkeypatch.setattr(event_bus, "backend", InMemoryEventBackend())
+    monkeypatch.setattr(event_bus, "has_run", lambda run_id: True)
+    sse = client.get(f"/runs/{run_id}/events")
+    assert sse.status_code == 200
+    assert sse.text.splitlines()[0] == "event: snapshot"
+
+
+def test_websocket_multiplexed_subscription(monkeypatch):
+    monkeypatch.setattr(llm_service, "get_client", lambda api_key=None: FakeLLMClient())
+    wf = client.post("/workflows", json={"name": "Socket", "steps": [{"action": "tone"}]}).json()
+    run_id = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hi"}).headers["x-run-id"]
+
+    with client.websocket_connect("/ws/runs") as ws:
+        ws.send_json({"action": "subscribe", "run_id": run_id})
+        messages = []
+        while True:
+            message = ws.receive_json()
+            messages.append(message)
+            if message["event"].get("status") == "workflow_completed":
+                break
+    assert all(m["run_id"] == run_id for m in messages)
+    assert [m["id"] for m in messages] == list(range(1, len(messages) + 1))
+
+
+def test_sse_unknown_run():
+    assert client.get("/runs/not-a-uuid/events").status_code == 404
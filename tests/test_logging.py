@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+import logging
+import queue
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.logging_config import AsyncQueueHandler, JsonFormatter, SamplingFilter, _parse_overrides
+
+
+def _record(name="app", level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_formatter_includes_arbitrary_extras():
+    entry = json.loads(JsonFormatter().format(_record(attempts=3, model="m", predicted_tokens=120)))
+    assert entry["message"] == "hello world"
+    assert entry["level"] == "INFO"
+    assert entry["attempts"] == 3
+    assert entry["model"] == "m"
+    assert entry["predicted_tokens"] == 120
+    assert entry["timestamp"].endswith("+00:00")
+    assert "args" not in entry and "lineno" not in entry
+
+
+def test_formatter_skips_uvicorn_color_message():
+    record = _record(msg="Started server process", args=(), color_message="Started \x1b[36mserver\x1b[0m")
+    assert "color_message" not in json.loads(JsonFormatter().format(record))
+
+
+def test_queue_handler_renders_exceptions_and_drops_when_full():
+    handler = AsyncQueueHandler(queue.Queue(maxsize=1))
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = _record(level=logging.ERROR, msg="failed %s")
+        record.exc_info = sys.exc_info()
+    handler.handle(record)
+    handler.handle(_record())
+    assert handler.dropped == 1
+
+    queued = handler.queue.get_nowait()
+    assert queued.exc_info is None
+    entry = json.loads(JsonFormatter().format(queued))
+    assert "ValueError: boom" in entry["exception"]
+    assert record.exc_info is not None  # original record untouched
+
+
+def test_sampling_always_keeps_warnings_and_errors():
+    sampler = SamplingFilter(sample_rate=0.0)
+    assert not sampler.filter(_record(level=logging.INFO))
+    assert sampler.filter(_record(level=logging.WARNING))
+    assert sampler.filter(_record(level=logging.ERROR))
+    assert sampler.sampled_out == 1
+
+
+def test_sampling_overrides_apply_to_child_loggers():
+    sampler = SamplingFilter(sample_rate=0.0, overrides=_parse_overrides("routers=1, main=0.0"))
+    kept = _record(name="routers.workflows")
+    assert sampler.filter(kept)
+    assert not hasattr(kept, "sample_rate")
+    assert not sampler.filter(_record(name="main"))
+
+
+def test_rate_limit_is_per_logger():
+    sampler = SamplingFilter(rate_limit=2)
+    results = [sampler.filter(_record(name="busy")) for _ in range(5)]
+    assert results[:2] == [True, True]
+    assert not any(results[2:])
+    assert sampler.filter(_record(name="quiet"))
+    assert sampler.filter(_record(name="busy", level=logging.ERROR))
+    assert sampler.rate_limited == 3
+
+
+def test_fractional_rate_limit_still_admits_records():
+    sampler = SamplingFilter(rate_limit=0.5)
+    assert sampler.filter(_record(name="slow"))
+    assert not sampler.filter(_record(name="slow"))
+    sampler._buckets["slow"][1] -= 2  # two seconds later
+    assert sampler.filter(_record(name="slow"))
@@ -0,0 +1,33 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import core.sanitizer as sanitizer
+from core.sanitizer import sanitize_text, sanitize_name
+
+def test_plain_text_fast_path():
+    assert sanitize_text("  Hello, world  ") == "Hello, world"
+    assert sanitize_text('He said "hi" > there') == "He said &quot;hi&quot; &gt; there"
+
+def test_strips_tags_and_escapes():
+    text = "<script>alert(1)</script>Fish & <b>chips</b>"
+    assert sanitize_text(text) == "alert(1)Fish &amp; chips"
+
+def test_truncation_does_not_split_entities():
+    assert sanitize_text("abc&def", max_length=5) == "abc"
+    assert sanitize_text("abc&def", max_length=8) == "abc&amp;"
+
+def test_tags_across_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(sanitizer, "_MIN_CHUNK", 3)
+    text = "one <span class='x'>two</span> <a<b> three & <unclosed four"
+    expected = "one two  three &amp; &lt;unclosed four"
+    assert sanitize_text(text, max_length=1000) == expected
+
+def test_large_input_truncated():
+    text = "<p>word & more</p> " * 100000
+    result = sanitize_text(text, max_length=50)
+    assert len(result) <= 50
+    assert result.startswith("word &amp; more")
+
+def test_sanitize_name_limit():
+    assert len(sanitize_name("x" * 500)) == 200
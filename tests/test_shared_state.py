@@ -0,0 +1,66 @@
+import pytest
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.state import LocalStateBackend, RedisStateBackend, create_state_backend
+from services.events import RedisEventBackend, RunNotFound
+from services.tracing import Tracer
+
+def test_local_state_roundtrip_and_expiry():
+    state = LocalStateBackend()
+    state.set_json("a", {"x": 1})
+    assert state.get_json("a") == {"x": 1}
+    state.set_json("b", [1], ttl_seconds=-1)
+    assert state.get_json("b") is None
+
+def test_state_counters():
+    fakeredis = pytest.importorskip("fakeredis")
+    for state in (LocalStateBackend(), RedisStateBackend("redis://unused", client=fakeredis.FakeRedis(decode_responses=True))):
+        assert state.incr("c", 5, ttl_seconds=60) == 5
+        assert state.incr("c", -2, ttl_seconds=60) == 3
+
+def test_create_state_backend_rejects_unknown_scheme():
+    assert isinstance(create_state_backend(None), LocalStateBackend)
+    with pytest.raises(ValueError):
+        create_state_backend("memcached://localhost")
+
+def test_redis_event_backend_replay_across_clients():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    backend = RedisEventBackend(
+        "redis://unused",
+        client=fakeredis.FakeRedis(server=server, decode_responses=True),
+        async_client_factory=lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+    assert not backend.has_run("run")
+    backend.publish("run", {"n": 1})
+    backend.publish("run", {"n": 2})
+    backend.publish("run", {"n": 3}, final=True)
+    assert backend.has_run("run")
+
+    async def collect(after_id):
+        return [item async for item in backend.subscribe("run", after_id=after_id)]
+
+    assert asyncio.run(collect(0)) == [(1, {"n": 1}), (2, {"n": 2}), (3, {"n": 3})]
+    assert asyncio.run(collect(2)) == [(3, {"n": 3})]
+
+    async def collect_missing():
+        return [item async for item in backend.subscribe("missing")]
+
+    with pytest.raises(RunNotFound):
+        asyncio.run(collect_missing())
+
+def test_traces_visible_through_shared_state():
+    fakeredis = pytest.importorskip("fakeredis")
+    state = RedisStateBackend("redis://unused", client=fakeredis.FakeRedis(decode_responses=True))
+    worker_a = Tracer(state=state)
+    worker_b = Tracer(state=state)
+
+    trace = worker_a.start_run()
+    worker_a.register("run-1", trace)
+    worker_a.finish(trace, "completed")
+    worker_a._exporter.shutdown(wait=True)
+
+    timeline = worker_b.get_timeline("run-1")
+    assert timeline["trace_id"] == trace.trace_id
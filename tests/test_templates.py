@@ -0,0 +1,76 @@
+import sys
+import os
+import json
+import uuid
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from main import app
+from core.templates import PREDEFINED_TEMPLATES
+from routers import workflows
+from services.llm import llm_service
+from services.templates import definition_hash
+from tests.test_events import FakeLLMClient
+
+client = TestClient(app)
+
+
+def test_templates_are_backed_by_workflows():
+    templates = client.get("/templates").json()
+    assert set(templates) == set(PREDEFINED_TEMPLATES)
+    for template in templates.values():
+        uuid.UUID(template["workflow_id"])
+        assert template["version"] >= 1
+
+
+def test_definition_hash_is_key_order_independent():
+    steps = [{"action": "clean", "params": {"a": 1, "b": 2}}]
+    reordered = [{"params": {"b": 2, "a": 1}, "action": "clean"}]
+    assert definition_hash("n", None, steps) == definition_hash("n", None, reordered)
+    assert definition_hash("n", None, steps) != definition_hash("m", None, steps)
+
+
+def test_identical_definitions_are_deduplicated():
+    name = f"Dedupe {uuid.uuid4().hex[:8]}"
+    body = {"name": name, "steps": [{"action": "clean"}, {"action": "summarize"}]}
+    first = client.post("/workflows", json=body).json()
+    second = client.post("/workflows", json=body).json()
+    assert first["id"] == second["id"]
+
+    renamed = client.post("/workflows", json={**body, "name": name + "!"}).json()
+    assert renamed["id"] != first["id"]
+
+
+def test_template_run_stream(monkeypatch):
+    monkeypatch.setattr(workflows.limiter, "enabled", False)
+    monkeypatch.setattr(llm_service, "get_client", lambda api_key=None: FakeLLMClient())
+    key = next(iter(PREDEFINED_TEMPLATES))
+
+    resp = client.post(f"/templates/{key}/run_stream", json={"input_text": "Hello"})
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert lines[-1]["status"] == "workflow_completed"
+
+    runs = client.get("/runs", params={"limit": 1}).json()
+    assert runs[0]["workflow_id"] == client.get("/templates").json()[key]["workflow_id"]
+
+
+def test_unknown_template_returns_404(monkeypatch):
+    monkeypatch.setattr(workflows.limiter, "enabled", False)
+    resp = client.post("/templates/nope/run_stream", json={"input_text": "Hello"})
+    assert resp.status_code == 404
+
+
+def test_stream_routes_share_rate_limit(monkeypatch):
+    monkeypatch.setattr(llm_service, "get_client", lambda api_key=None: FakeLLMClient())
+    monkeypatch.setattr(workflows.limiter, "enabled", True)
+    workflows.limiter.reset()
+    wf = client.post("/workflows", json={"name": f"Limited {uuid.uuid4().hex}", "steps": [{"action": "clean"}]}).json()
+    key = next(iter(PREDEFINED_TEMPLATES))
+
+    for _ in range(3):
+        assert client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hi"}).status_code == 200
+    for _ in range(2):
+        assert client.post(f"/templates/{key}/run_stream", json={"input_text": "Hi"}).status_code == 200
+    assert client.post(f"/templates/{key}/run_stream", json={"input_text": "Hi"}).status_code == 429
+    assert client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hi"}).status_code == 429
+    workflows.limiter.reset()
@@ -0,0 +1,94 @@
+import pytest
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from main import app
+from core.config import settings
+from routers import workflows
+from services.llm import llm_service
+from services.tracing import RunTrace, Tracer, NoopTrace, tracer
+from test_events import FakeLLMClient
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(workflows.limiter, "enabled", False)
+    monkeypatch.setattr(llm_service, "get_client", lambda api_key=None: FakeLLMClient())
+
+
+def test_spans_nest_and_export_as_otlp():
+    trace = RunTrace(**{"workflow.id": "wf"})
+    with trace.span("step", step=1) as step:
+        with trace.span("llm.request") as llm:
+            llm.add_event("first_token")
+    trace.finish("completed")
+
+    spans = {span["name"]: span for span in trace.timeline()["spans"]}
+    assert spans["step"]["parent_id"] == spans["run"]["span_id"]
+    assert spans["llm.request"]["parent_id"] == spans["step"]["span_id"]
+    assert spans["llm.request"]["events"][0]["name"] == "first_token"
+
+    otlp = trace.to_otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(otlp) == 3
+    assert all(span["traceId"] == trace.trace_id for span in otlp)
+
+
+def test_timeline_is_a_snapshot_of_a_live_trace():
+    trace = RunTrace()
+    with trace.span("step") as span:
+        span.set("a", 1)
+        timeline = trace.timeline()
+        span.set("b", 2)
+        with trace.span("inner"):
+            pass
+    step = next(s for s in timeline["spans"] if s["name"] == "step")
+    assert step["attributes"] == {"a": 1}
+    assert [s["name"] for s in timeline["spans"]] == ["run", "step"]
+
+
+def test_unsampled_runs_are_noop():
+    assert isinstance(Tracer(sample_rate=0).start_run(), NoopTrace)
+    assert isinstance(Tracer(sample_rate=0).start_run(force=True), RunTrace)
+
+
+def test_file_export(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    local = Tracer(export_path=str(path))
+    trace = local.start_run()
+    local.register("run-1", trace)
+    local.finish(trace, "completed")
+    local._exporter.shutdown(wait=True)
+    exported = json.loads(path.read_text().splitlines()[0])
+    assert exported["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] == "run"
+
+
+def test_run_trace_endpoint():
+    wf = client.post("/workflows", json={"name": "Traced", "steps": [{"action": "keypoints"}]}).json()
+    run_id = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Trace me"}).headers["x-run-id"]
+
+    resp = client.get(f"/runs/{run_id}/trace")
+    assert resp.status_code == 200
+    names = [span["name"] for span in resp.json()["spans"]]
+    for expected in ("run", "db.create_run", "step", "llm.request", "db.save_step", "db.set_status"):
+        assert expected in names
+    llm = next(span for span in resp.json()["spans"] if span["name"] == "llm.request")
+    assert [event["name"] for event in llm["events"]] == ["connected", "first_token", "last_token"]
+    assert "profile" not in resp.json()
+
+
+def test_profile_requires_admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    wf = client.post("/workflows", json={"name": "Profiled", "steps": [{"action": "simplify"}]}).json()
+    headers = {"x-admin-token": "secret", "x-profile": "1"}
+    run_id = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Profile me"}, headers=headers).headers["x-run-id"]
+
+    assert "profile" in client.get(f"/runs/{run_id}/trace", headers={"x-admin-token": "secret"}).json()
+    assert "profile" not in client.get(f"/runs/{run_id}/trace").json()
+
+
+def test_missing_trace_404():
+    assert client.get("/runs/unknown/trace").status_code == 404
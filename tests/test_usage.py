@@ -0,0 +1,95 @@
+import pytest
+import sys
+import os
+import json
+import types
+import uuid
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from main import app
+from core.config import settings
+from db.database import SessionLocal
+from routers import workflows
+from services.llm import llm_service
+from services.state import LocalStateBackend
+from services.usage import BudgetExceeded, TokenLedger, api_key_id, estimate_tokens, extract_usage, predict_run_tokens, select_model
+from test_events import FakeChunk, FakeLLMClient
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(workflows.limiter, "enabled", False)
+    monkeypatch.setattr(llm_service, "get_client", lambda api_key=None: FakeLLMClient())
+
+
+def test_extract_usage_from_groq_chunk():
+    chunk = FakeChunk(None)
+    chunk.x_groq = types.SimpleNamespace(usage=types.SimpleNamespace(prompt_tokens=12, completion_tokens=34))
+    assert extract_usage(chunk) == (12, 34)
+    assert extract_usage(FakeChunk("text")) is None
+
+
+def test_api_key_id_is_stable_and_opaque():
+    assert api_key_id(None) == "server"
+    assert api_key_id("gsk_secret") == api_key_id("gsk_secret")
+    assert "secret" not in api_key_id("gsk_secret")
+
+
+def test_predict_run_tokens_grows_with_input():
+    steps = [{"action": "clean"}, {"action": "summarize"}]
+    assert predict_run_tokens(steps, "x" * 4000) > predict_run_tokens(steps, "x" * 40)
+
+
+def test_run_records_token_usage():
+    wf = client.post("/workflows", json={"name": f"Usage {uuid.uuid4().hex}", "steps": [{"action": "simplify"}]}).json()
+    resp = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hello there"}, headers={"x-groq-api-key": "k1"})
+    final = json.loads(resp.text.splitlines()[-1])
+    assert final["usage"]["completion_tokens"] == estimate_tokens("fake output")
+
+    report = client.get("/usage").json()
+    row = next(r for r in report["workflows"] if r["workflow_id"] == wf["id"])
+    assert row["runs"] == 1
+    assert row["total_tokens"] == final["usage"]["prompt_tokens"] + final["usage"]["completion_tokens"]
+    assert any(r["api_key_id"] == api_key_id("k1") for r in report["api_keys"])
+
+
+def test_budget_rejects_or_downgrades(monkeypatch):
+    wf = client.post("/workflows", json={"name": f"Budget {uuid.uuid4().hex}", "steps": [{"action": "simplify"}]}).json()
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_PER_RUN", 10)
+
+    resp = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hello"})
+    assert resp.status_code == 429
+
+    monkeypatch.setattr(settings, "BUDGET_DOWNGRADE_MODEL", "small-model")
+    resp = client.post(f"/workflows/{wf['id']}/run_stream", json={"input_text": "Hello"})
+    assert resp.status_code == 200
+    runs = client.get("/runs").json()
+    assert runs[0]["model"] == "small-model"
+
+
+def test_in_flight_reservations_count_against_daily_budget(monkeypatch):
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_PER_KEY_DAILY", 1500)
+    monkeypatch.setattr(settings, "BUDGET_DOWNGRADE_MODEL", "")
+    ledger = TokenLedger(LocalStateBackend())
+    key_id = f"key-{uuid.uuid4().hex}"
+
+    with SessionLocal() as db:
+        first = ledger.reserve(key_id, 1000)
+        assert select_model(db, key_id, 1000, "big", reserved=first.others) == "big"
+        # A concurrent run of the same key sees the first one's reservation
+        second = ledger.reserve(key_id, 1000)
+        assert second.others == 1000
+        with pytest.raises(BudgetExceeded):
+            select_model(db, key_id, 1000, "big", reserved=second.others)
+        second.release()
+
+    # Recorded usage replaces the reservation; releasing twice is harmless
+    first.settle(400)
+    probe = ledger.reserve(key_id, 1)
+    assert probe.others == 600
+    probe.release()
+    first.release()
+    first.release()
+    assert ledger.reserve(key_id, 1).others == 0